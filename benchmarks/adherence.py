@@ -0,0 +1,86 @@
+# Mede compute_adherence (NumPy, agrupado por senior) contra um laço Python
+# equivalente sobre um conjunto sintético de eventos de dose.
+#
+# Uso (na raiz do projeto):
+#   python -m benchmarks.adherence --events 1000000 --seniors 5000
+import argparse
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.adherence import (
+    ROLLING_WINDOWS,
+    STATUS_CODES,
+    TAKEN_CODES,
+    compute_adherence,
+)
+
+
+def synthetic_events(n_events: int, n_seniors: int, now: datetime, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    now = np.datetime64(now, "s")
+    scheduled = now - rng.integers(0, 30 * 86400, n_events).astype("timedelta64[s]")
+    codes = [STATUS_CODES[s] for s in ("taken", "late", "missed", "skipped")]
+    status = rng.choice(codes, n_events, p=[0.7, 0.15, 0.1, 0.05]).astype(np.int8)
+    delay = rng.exponential(20 * 60, n_events).astype("timedelta64[s]")
+    taken_at = np.where(
+        np.isin(status, TAKEN_CODES), scheduled + delay, np.datetime64("NaT")
+    )
+    return {
+        "senior": rng.integers(0, n_seniors, n_events),
+        "scheduled": scheduled,
+        "taken_at": taken_at.astype("datetime64[s]"),
+        "status": status,
+    }
+
+
+def python_adherence(events: dict, days: int, now: datetime) -> dict:
+    # Referência: uma passada por evento, como os relatórios montam listas hoje
+    rows = zip(
+        events["senior"].tolist(),
+        events["scheduled"].tolist(),
+        events["status"].tolist(),
+    )
+    windows = {w: now - timedelta(days=w) for w in (days, *ROLLING_WINDOWS)}
+    counts = defaultdict(lambda: [0, 0])
+    for senior, scheduled, status in rows:
+        for window, since in windows.items():
+            if since <= scheduled <= now:
+                bucket = counts[(senior, window)]
+                bucket[0] += 1
+                bucket[1] += status in TAKEN_CODES
+    return {key: hits / total for key, (total, hits) in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--seniors", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    now = datetime.utcnow().replace(microsecond=0)
+    events = synthetic_events(args.events, args.seniors, now)
+    print(f"{args.events} eventos, {args.seniors} seniors, janela de {args.days} dias")
+
+    started = time.perf_counter()
+    metrics = compute_adherence(events, args.seniors, args.days, now)
+    vectorized = time.perf_counter() - started
+    print(f"{'numpy (agrupado)':<20} {vectorized * 1000:>10.1f} ms")
+
+    started = time.perf_counter()
+    reference = python_adherence(events, args.days, now)
+    looped = time.perf_counter() - started
+    print(f"{'laço Python':<20} {looped * 1000:>10.1f} ms ({looped / vectorized:.0f}x)")
+
+    # Confere que as duas versões concordam
+    for senior in range(min(args.seniors, 100)):
+        expected = reference.get((senior, args.days))
+        if expected is not None:
+            assert abs(metrics["adherence"][senior] - expected) < 1e-9
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Teste de estresse das dispensas concorrentes num compartimento. Compara o
+# fluxo antigo (ler quantity, gravar o valor calculado no cliente) com o
+# UPDATE condicional do POST /compartment/{id}/dispense.
+#
+# Uso (na raiz do projeto):
+#   python -m benchmarks.dispense_stress --threads 8 --dispenses 200
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from utils.db_config import configure_engine
+
+READ_MODIFY_WRITE = "read-modify-write (PATCH)"
+CONDITIONAL_UPDATE = "UPDATE condicional (dispense)"
+
+
+def dispense_read_modify_write(conn) -> bool:
+    quantity = conn.execute(
+        text("SELECT quantity FROM compartment WHERE compartment_id = 'c1'")
+    ).scalar_one()
+    if quantity < 1:
+        return False
+    time.sleep(0)  # Cede a vez, como a ida e volta do cliente
+    conn.execute(
+        text(
+            "UPDATE compartment SET quantity = :q, version = version + 1 "
+            "WHERE compartment_id = 'c1'"
+        ),
+        {"q": quantity - 1},
+    )
+    return True
+
+
+def dispense_conditional(conn) -> bool:
+    row = conn.execute(
+        text(
+            "UPDATE compartment SET quantity = quantity - :n, version = version + 1 "
+            "WHERE compartment_id = 'c1' AND quantity >= :n "
+            "RETURNING quantity"
+        ),
+        {"n": 1},
+    ).first()
+    return row is not None
+
+
+def run(strategy, threads: int, dispenses: int, stock: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'stress.db')}",
+            pool_size=threads,
+            connect_args={"check_same_thread": False},
+        )
+        configure_engine(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE TABLE compartment (compartment_id TEXT PRIMARY KEY, "
+                    "quantity INTEGER NOT NULL, version INTEGER NOT NULL)"
+                )
+            )
+            conn.execute(
+                text("INSERT INTO compartment VALUES ('c1', :q, 1)"), {"q": stock}
+            )
+
+        succeeded = [0] * threads
+        errors = [0] * threads
+
+        def worker(index: int):
+            for _ in range(dispenses):
+                try:
+                    with engine.begin() as conn:
+                        if strategy(conn):
+                            succeeded[index] += 1
+                except OperationalError:
+                    # SQLite não promove leitura a escrita com outro escritor ativo
+                    errors[index] += 1
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - started
+        with engine.connect() as conn:
+            final = conn.execute(
+                text("SELECT quantity FROM compartment WHERE compartment_id = 'c1'")
+            ).scalar_one()
+        engine.dispose()
+    dispensed = sum(succeeded)
+    return {
+        "dispensed": dispensed,
+        "final": final,
+        # Dispensas confirmadas ao cliente que não saíram do estoque
+        "lost": dispensed - (stock - final),
+        "errors": sum(errors),
+        "rate": threads * dispenses / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--dispenses", type=int, default=200)
+    args = parser.parse_args()
+    # Estoque menor que o total pedido: também exercita o "quantity >= n"
+    stock = args.threads * args.dispenses // 2
+
+    print(f"{args.threads} threads x {args.dispenses} dispensas, estoque {stock}")
+    for name, strategy in [
+        (READ_MODIFY_WRITE, dispense_read_modify_write),
+        (CONDITIONAL_UPDATE, dispense_conditional),
+    ]:
+        result = run(strategy, args.threads, args.dispenses, stock)
+        print(
+            f"{name:<30} {result['rate']:>8.0f} ops/s  dispensadas "
+            f"{result['dispensed']:>5}  final {result['final']:>5}  "
+            f"perdidas {result['lost']:>5}  erros {result['errors']:>5}"
+        )
+        if strategy is dispense_conditional:
+            # Invariantes: nada perdido e estoque nunca negativo
+            assert result["final"] == stock - result["dispensed"] >= 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Compara os caminhos de serialização das listas grandes (/symptoms/,
+# /prescriptions/) e o tamanho da resposta com e sem compressão.
+#
+# Uso (na raiz do projeto):
+#   python -m benchmarks.serialization --items 500
+import argparse
+import gzip
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from schemas.prescription import PrescriptionRead
+from schemas.symptom import SymptomRead
+from utils.serialization import dump_json_list
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def symptoms(n: int) -> list:
+    now = datetime.utcnow()
+    return [
+        SymptomRead(
+            id=str(uuid.uuid4()),
+            senior_id="12345678901",
+            name=f"Sintoma {i}",
+            description="Paciente relatou tontura ao levantar pela manhã",
+            pain_level=i % 10,
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(n)
+    ]
+
+
+def prescriptions(n: int) -> list:
+    now = datetime.utcnow()
+    return [
+        PrescriptionRead(
+            id=str(uuid.uuid4()),
+            description="Tomar após as refeições",
+            senior_id="12345678901",
+            medication_id="med-1",
+            doctor_id="doc-1",
+            dosage="1 comprimido",
+            frequency="8",
+            start_date=now.isoformat(),
+            end_date=(now + timedelta(days=30)).isoformat(),
+            medication={"id": "med-1", "name": "Dipirona", "description": None},
+            doctor={"id": "doc-1", "name": "Dr. Serena"},
+            created_at=now,
+        )
+        for _ in range(n)
+    ]
+
+
+def timed(fn, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return (time.perf_counter() - started) / repeat * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for name, model, items in [
+        ("/symptoms/", SymptomRead, symptoms(args.items)),
+        ("/prescriptions/", PrescriptionRead, prescriptions(args.items)),
+    ]:
+        print(f"{name} ({args.items} itens)")
+        engines = {
+            "jsonable_encoder + json": lambda: json.dumps(
+                jsonable_encoder(items)
+            ).encode(),
+            "jsonable_encoder + orjson": lambda: orjson.dumps(jsonable_encoder(items)),
+            "TypeAdapter.dump_json": lambda: dump_json_list(model, items),
+        }
+        for engine, fn in engines.items():
+            ms, body = timed(fn, args.repeat)
+            print(f"  {engine:<28} {ms:>8.2f} ms")
+        sizes = {"sem compressão": len(body), "gzip": len(gzip.compress(body, 6))}
+        if brotli:
+            sizes["brotli"] = len(brotli.compress(body, quality=4))
+        print("  " + ", ".join(f"{k}: {v} bytes" for k, v in sizes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Compara a vazão de escrita do SQLite com os pragmas padrão (rollback journal)
+# e com o perfil configurado em utils/db_config.py (WAL + synchronous=NORMAL).
+#
+# Uso (na raiz do projeto):
+#   python -m benchmarks.sqlite_journal_modes --rows 2000 --threads 4
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from utils.db_config import configure_engine, get_sqlite_pragmas
+
+PROFILES = {
+    "rollback (DELETE/FULL)": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    "WAL/NORMAL (padrão)": get_sqlite_pragmas(),
+}
+
+
+def run_profile(pragmas: dict, rows: int, threads: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        configure_engine(engine, pragmas)
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE TABLE symptom (id INTEGER PRIMARY KEY, senior_id TEXT, "
+                    "name TEXT, pain_level INTEGER, created_at TEXT)"
+                )
+            )
+
+        # Um commit por linha, como cada POST da API faz
+        def writer(count: int):
+            for i in range(count):
+                with engine.begin() as conn:
+                    conn.execute(
+                        text(
+                            "INSERT INTO symptom (senior_id, name, pain_level, "
+                            "created_at) VALUES (:s, :n, :p, datetime('now'))"
+                        ),
+                        {"s": "12345678901", "n": f"sintoma {i}", "p": i % 10},
+                    )
+
+        per_thread = rows // threads
+        workers = [
+            threading.Thread(target=writer, args=(per_thread,)) for _ in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+        return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.rows} inserts, {args.threads} threads, 1 commit por insert")
+    for name, pragmas in PROFILES.items():
+        rate = run_profile(pragmas, args.rows, args.threads)
+        print(f"{name:<28} {rate:>10.0f} commits/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Custo de partida a frio de um worker: tempo de import da aplicação (com os
+# módulos mais pesados, via -X importtime) e do lifespan em cada cenário de
+# banco. Cada medição roda num processo novo, como um worker recém-criado.
+#
+# Uso (na raiz do projeto):
+#   python -m benchmarks.startup --repeat 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOOT_SNIPPET = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def boot():
+    async with main.lifespan(main.app):
+        pass
+
+asyncio.run(boot())
+lifespan = time.perf_counter() - imported
+print(json.dumps({"import": imported - started, "lifespan": lifespan}))
+"""
+
+
+def run_python(args: list, database: str, seed: bool = False):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database}",
+        "SEED_DB": "1" if seed else "0",
+    }
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def boot(database: str, seed: bool = False) -> dict:
+    result = run_python(["-c", BOOT_SNIPPET], database, seed)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(database: str, top: int) -> tuple:
+    # Linhas "import time: self [us] | cumulative | pacote", filhos antes do pai
+    # e com dois espaços a mais de recuo por nível
+    result = run_python(["-X", "importtime", "-c", "import main"], database)
+    total, children, pending, modules = 0, [], [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name, cumulative_us = name.strip(), int(cumulative_us)
+        modules.append((name, int(self_us)))
+        if depth == 1:
+            pending.append((name, cumulative_us))
+        elif depth == 0:
+            if name == "main":
+                total, children = cumulative_us, pending
+            pending = []
+    children.sort(key=lambda m: -m[1])
+    modules.sort(key=lambda m: -m[1])
+    return total, children[:top], modules[:top]
+
+
+def summarize(samples: list) -> str:
+    imports = statistics.median(s["import"] for s in samples) * 1000
+    lifespans = statistics.median(s["lifespan"] for s in samples) * 1000
+    return f"import {imports:>8.1f} ms  lifespan {lifespans:>8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "startup.db")
+        total, roots, heaviest = import_profile(database, args.top)
+        print(f"import main: {total / 1000:.1f} ms (-X importtime)")
+        print("  imports diretos de main (cumulativo):")
+        for name, us in roots:
+            print(f"    {name:<40} {us / 1000:>8.1f} ms")
+        print("  maiores módulos (próprio):")
+        for name, us in heaviest:
+            print(f"    {name:<40} {us / 1000:>8.1f} ms")
+
+        # Mediana de processos novos; cada cenário com o seu banco
+        cold = [
+            boot(os.path.join(tmp, f"empty-{i}.db")) for i in range(args.repeat)
+        ]
+        print(f"{'banco vazio (cria tabelas)':<36} {summarize(cold)}")
+        boot(database)  # Cria as tabelas; daqui em diante só a checagem
+        warm = [boot(database) for _ in range(args.repeat)]
+        print(f"{'tabelas já existem':<36} {summarize(warm)}")
+        seeded = os.path.join(tmp, "seeded.db")
+        run_python(["-m", "seed"], seeded)
+        reseed = [boot(seeded, seed=True) for _ in range(args.repeat)]
+        print(f"{'SEED_DB=1 (banco já semeado)':<36} {summarize(reseed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,49 @@
+import os
+import time
+
+from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.user import User
+from utils.cache import TaggedCache
+from utils.db_config import configure_engine, get_engine_options
 from utils.jwt import decode_access_token
 
-DATABASE_URL = "sqlite:///./serena.db"
-engine = create_engine(DATABASE_URL, echo=True)
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./serena.db")
+
+
+def get_async_database_url(url: str) -> str:
+    # Mesmo banco, driver assíncrono: aiosqlite para SQLite, asyncpg para Postgres
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    for prefix in ("postgresql://", "postgres://", "postgresql+psycopg2://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix) :]
+    return url
+
+
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+
+# Pool, echo e pragmas do SQLite vêm do ambiente (ver utils/db_config.py)
+engine = create_engine(DATABASE_URL, **get_engine_options(DATABASE_URL))
+configure_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **get_engine_options(ASYNC_DATABASE_URL)
+)
+configure_engine(async_engine.sync_engine)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+# Usuário autenticado por token, com as tags user.id e email
+USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+user_cache = TaggedCache(maxsize=10000, ttl=USER_CACHE_TTL)
 
 
 def get_session():
@@ -18,224 +51,122 @@ def get_session():
         yield session
 
 
-def create_db_and_tables():
-    from sqlalchemy.exc import IntegrityError
-
-    from models import medication, prescription, report, senior, symptom, user
-    from models.medication import Medication
-    from models.user import User
+async def get_async_session():
+    # expire_on_commit=False: em rotas async não há lazy load depois do commit
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
 
-    SQLModel.metadata.create_all(engine)
 
-    # Popula a tabela de medicações se estiver vazia
-    with Session(engine) as session:
-        if not session.query(Medication).first():
-            meds = [
-                Medication(name="Paracetamol", description="Analgésico e antitérmico"),
-                Medication(name="Dipirona", description="Analgésico e antitérmico"),
-                Medication(name="Ibuprofeno", description="Anti-inflamatório"),
-                Medication(name="Amoxicilina", description="Antibiótico"),
-                Medication(name="Losartana", description="Anti-hipertensivo"),
-                Medication(name="Metformina", description="Antidiabético oral"),
-                Medication(name="Omeprazol", description="Inibidor de bomba de próton"),
-                Medication(name="Sinvastatina", description="Redutor de colesterol"),
-                Medication(name="AAS", description="Antiplaquetário"),
-                Medication(name="Ranitidina", description="Antiácido"),
-            ]
-            session.add_all(meds)
-            session.commit()
-        # Cria usuário admin padrão se não existir
-        if not session.query(User).filter(User.email == "admin@serena.com").first():
-            from passlib.context import CryptContext
-
-            pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-            admin = User(
-                name="Admin",
-                email="admin@serena.com",
-                password=pwd_context.hash("admin123"),
-                role="caregiver",
-            )
-            session.add(admin)
-            try:
-                session.commit()
-            except IntegrityError:
-                session.rollback()
-
-        # Popula as demais tabelas se não houver dados
-        import uuid
-        from datetime import datetime, timedelta
-
-        from passlib.context import CryptContext
-
-        from models.compartment import Compartment
-        from models.device import Device
-        from models.dispenser import Dispenser
-        from models.medication import Medication
-        from models.prescription import Prescription
-        from models.report import Report
-        from models.senior import Senior
-        from models.symptom import Symptom
-        from models.user import User
-        from models.usersenior import UserSenior
-
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-        # Doctor
-        doctor = session.query(User).filter(User.email == "doctor@serena.com").first()
-        if not doctor:
-            doctor = User(
-                name="Dr. Serena",
-                email="doctor@serena.com",
-                password=pwd_context.hash("doctor123"),
-                role="doctor",
-            )
-            session.add(doctor)
-            session.commit()
-            session.refresh(doctor)
-        # Senior
-        senior = session.query(Senior).filter(Senior.name == "Paciente Exemplo").first()
-        if not senior:
-            cpf_exemplo = "12345678901"  # CPF de exemplo, 11 dígitos
-            senior = Senior(
-                id=cpf_exemplo,
-                name="Paciente Exemplo",
-                birth_date="01/01/1950",
-                created_at=datetime.utcnow().isoformat(),
-            )
-            session.add(senior)
-            session.commit()
-            session.refresh(senior)
-        # UserSenior - Doctor
-        if (
-            not session.query(UserSenior)
-            .filter(UserSenior.user_id == doctor.id, UserSenior.senior_id == senior.id)
-            .first()
-        ):
-            usersenior_doctor = UserSenior(user_id=doctor.id, senior_id=senior.id)
-            session.add(usersenior_doctor)
-            session.commit()
-        # Caregiver
-        caregiver = session.query(User).filter(User.email == "admin@serena.com").first()
-        # Device
-        device = session.query(Device).filter(Device.senior_id == senior.id).first()
-        if not device:
-            device = Device(
-                id="0",
-                senior_id=senior.id,
-                status="active",
-                last_sync=datetime.utcnow(),
-            )
-            session.add(device)
-            session.commit()
-            session.refresh(device)
-        # Dispenser
-        dispenser = (
-            session.query(Dispenser).filter(Dispenser.device_id == device.id).first()
-        )
-        if not dispenser:
-            dispenser = Dispenser(device_id=device.id)
-            session.add(dispenser)
-            session.commit()
-            session.refresh(dispenser)
-        # Compartments
-        if (
-            not session.query(Compartment)
-            .filter(Compartment.dispenser_id == dispenser.id)
-            .first()
-        ):
-            meds = session.query(Medication).all()
-            for i in range(14):
-                # Deixe os 3 últimos compartimentos sem medicação
-                if i >= 11:
-                    med_id = ""
-                    quantity = 0
-                else:
-                    med_id = meds[i % len(meds)].id if meds else None
-                    quantity = 10 + i
-                compartment = Compartment(
-                    dispenser_id=dispenser.id,
-                    medication_id=med_id,
-                    quantity=quantity,
+def _column_backfill(column):
+    # Valor das linhas antigas: o default declarado no model (escalar ou factory)
+    default = column.default
+    if default is None:
+        return None
+    return default.arg(None) if default.is_callable else default.arg
+
+
+def _upgrade_existing_tables(inspector, tables: set):
+    # create_all não altera tabelas existentes: colunas e índices novos dos models
+    # entram aqui. Idempotente; sem NOT NULL porque o SQLite não aceita ADD
+    # COLUMN NOT NULL sem default constante, então as linhas antigas recebem o
+    # default.
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            missing = [c for c in table.columns if c.name not in present]
+            for column in missing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(
+                        f'ALTER TABLE "{table.name}" '
+                        f'ADD COLUMN "{column.name}" {column_type}'
+                    )
                 )
-                session.add(compartment)
-            session.commit()
-        # UserSenior
-        if (
-            not session.query(UserSenior)
-            .filter(
-                UserSenior.user_id == caregiver.id, UserSenior.senior_id == senior.id
-            )
-            .first()
-        ):
-            usersenior = UserSenior(user_id=caregiver.id, senior_id=senior.id)
-            session.add(usersenior)
-            session.commit()
-        # Prescriptions
-        if (
-            not session.query(Prescription)
-            .filter(Prescription.senior_id == senior.id)
-            .first()
-        ):
-            meds = session.query(Medication).all()
-            frequencies = [
-                "8",
-                "12",
-            ]  # Frequências diferentes para os dois medicamentos
-            for idx, med in enumerate(meds[:2]):
-                prescription = Prescription(
-                    senior_id=senior.id,
-                    medication_id=med.id,
-                    doctor_id=doctor.id,
-                    description=f"Qualquer descrição para {med.name}",
-                    dosage="1 comprimido",
-                    frequency=frequencies[idx] if idx < len(frequencies) else "8",
-                    start_date=datetime.utcnow(),
-                    end_date=datetime.utcnow() + timedelta(days=30),
-                )
-                session.add(prescription)
-            session.commit()
-        # Symptoms
-        if not session.query(Symptom).filter(Symptom.senior_id == senior.id).first():
-            symptom1 = Symptom(
-                senior_id=senior.id,
-                name="Dor de cabeça",
-                description="Paciente levantou rápido e sentiu dor",
-                pain_level=5,
-            )
-            symptom2 = Symptom(
-                senior_id=senior.id,
-                name="Náusea",
-                description="Acordou enjoado",
-                pain_level=2,
-            )
-            session.add_all([symptom1, symptom2])
-            session.commit()
-        # Report
-        from models.report import Report
-
-        if not session.query(Report).filter(Report.user_id == caregiver.id).first():
-            report = Report(
-                user_id=caregiver.id,
-                content="Relatório inicial do paciente.",
-                created_at=datetime.utcnow().isoformat(),
-            )
-            session.add(report)
-            session.commit()
+            # Um UPDATE depois de todos os ALTER: onupdate de outra coluna nova
+            # (ex.: updated_at) não pode apontar para coluna que ainda não existe
+            backfill = {c.name: _column_backfill(c) for c in missing}
+            backfill = {name: v for name, v in backfill.items() if v is not None}
+            if backfill:
+                conn.execute(table.update().values(backfill))
+            # Índices depois das colunas: podem usar uma coluna recém-criada
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn, checkfirst=True)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_session)):
-    credentials_exception = HTTPException(
+def create_db_and_tables():
+    # Roda a cada boot, então é barato: só consultas ao catálogo do banco,
+    # create_all se faltar tabela, ALTER se faltar coluna e CREATE INDEX se
+    # faltar índice. O import de
+    # models.user acima já registrou todas as tabelas (models/__init__).
+    # Dados iniciais: python -m seed.
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    if not existing.issuperset(SQLModel.metadata.tables):
+        SQLModel.metadata.create_all(engine)
+    _upgrade_existing_tables(inspector, existing)
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _token_subject(token: str) -> tuple:
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     username: str = payload.get("sub")
     if username is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return username, payload.get("exp")
+
+
+def _cache_user(token: str, user: User, expires_at):
+    # Nunca guarda além da expiração do próprio token
+    ttl = USER_CACHE_TTL
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - time.time())
+    if ttl > 0:
+        user_cache.set(token, user, tags=[user.id, user.email], ttl=ttl)
+
+
+# O FastAPI já resolve cada dependência uma vez por request; o cache evita
+# decodificar o JWT e buscar o User de novo nos requests seguintes
+def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_session)):
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+    username, expires_at = _token_subject(token)
     user = db.query(User).filter(User.email == username).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    db.expunge(user)
+    _cache_user(token, user, expires_at)
     return user
+
+
+async def get_user_by_token_async(token: str, db: AsyncSession) -> User:
+    # Também usado por WebSockets, que recebem o token na query string
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+    username, expires_at = _token_subject(token)
+    user = (await db.exec(select(User).where(User.email == username))).first()
+    if user is None:
+        raise _credentials_exception()
+    db.expunge(user)
+    _cache_user(token, user, expires_at)
+    return user
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_session)
+):
+    return await get_user_by_token_async(token, db)
@@ -1,17 +1,22 @@
+import asyncio
 import os
 from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 # Import your routers and database setup here
 from database import create_db_and_tables
 from routers import (
     dispenser,
+    events,
     medications,
     prescriptions,
     reports,
+    schedule,
     senior,
     symptoms,
     users,
@@ -19,17 +24,41 @@ from routers import (
 from routers.auth import router as auth_router
 from routers.compartment import router as compartment_router
 from routers.device import router as device_router
+from seed import seed_db
+from utils.db_config import env_bool
+from utils.etag import ETagMiddleware
+from utils.medication_catalog import medication_catalog
+from utils.pagination import NEXT_CURSOR_HEADER
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli-asgi é opcional; sem ele, só gzip
+    BrotliMiddleware = None
 
 load_dotenv()
 
+# Respostas menores que isso não compensam o custo de comprimir
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1000"))
+# Semeia no boot (desenvolvimento); em produção, rode python -m seed uma vez
+SEED_DB = env_bool("SEED_DB")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
+    if SEED_DB:
+        seed_db()
+    # Carga inicial fora do event loop, como as recargas (ver _reload)
+    await asyncio.to_thread(medication_catalog.load)
     yield
 
 
-app = FastAPI(title="Serena API", version="1.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="Serena API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,18 +66,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
+# ETag/304 para os GETs que ainda não calculam o próprio
+app.add_middleware(ETagMiddleware)
+# Compressão por fora do ETag: o hash é do corpo sem compressão
+if BrotliMiddleware:
+    app.add_middleware(
+        BrotliMiddleware, minimum_size=COMPRESS_MIN_SIZE, gzip_fallback=True
+    )
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
 
 app.include_router(prescriptions, prefix="/prescriptions", tags=["prescriptions"])
 app.include_router(medications, prefix="/medications", tags=["medications"])
 app.include_router(symptoms, prefix="/symptoms", tags=["symptoms"])
 app.include_router(reports, prefix="/reports", tags=["reports"])
+app.include_router(schedule, prefix="/schedule", tags=["schedule"])
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(users, prefix="/users", tags=["users"])
 app.include_router(senior, prefix="/senior", tags=["senior"])
 app.include_router(device_router, prefix="/device", tags=["device"])
 app.include_router(dispenser, prefix="/dispenser", tags=["dispenser"])
 app.include_router(compartment_router, prefix="/compartment", tags=["compartment"])
+app.include_router(events, prefix="/events", tags=["events"])
 
 if __name__ == "__main__":
     import uvicorn
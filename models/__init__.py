@@ -1,6 +1,9 @@
 from .compartment import Compartment
+from .compartmentforecast import CompartmentForecast
 from .device import Device
 from .dispenser import Dispenser
+from .doseevent import DoseEvent
+from .doseschedule import DoseSchedule
 from .medication import Medication
 from .prescription import Prescription
 from .report import Report
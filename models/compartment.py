@@ -1,4 +1,5 @@
 import uuid
+from datetime import datetime
 from typing import TYPE_CHECKING, Optional
 
 from sqlmodel import Field, Relationship, SQLModel
@@ -15,5 +16,11 @@ class Compartment(SQLModel, table=True):
     dispenser_id: str = Field(foreign_key="dispenser.id")
     medication_id: str = Field(foreign_key="medication.id")
     quantity: int
+    # Controle otimista: todo UPDATE incrementa; escritas podem exigir a versão lida
+    version: int = Field(default=1)
+    # Cursor do sync de devices: muda a cada UPDATE
+    updated_at: datetime = Field(
+        default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow}
+    )
     dispenser: Optional["Dispenser"] = Relationship(back_populates="compartments")
     medication: Optional["Medication"] = Relationship()
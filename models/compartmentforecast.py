@@ -0,0 +1,20 @@
+from datetime import date, datetime
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class CompartmentForecast(SQLModel, table=True):
+    # Pré-calculado em utils/forecast.py a cada escrita de compartimento ou
+    # prescrição; senior_id/dispenser_id desnormalizados para as listagens
+    compartment_id: str = Field(
+        foreign_key="compartment.compartment_id", primary_key=True
+    )
+    dispenser_id: str = Field(foreign_key="dispenser.id", index=True)
+    senior_id: str = Field(foreign_key="senior.id", index=True)
+    medication_id: str = Field(foreign_key="medication.id")
+    quantity: int
+    doses_per_day: float
+    empty_at: Optional[datetime] = None  # None: as prescrições acabam antes
+    refill_date: Optional[date] = None
+    computed_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,33 @@
+import enum
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class DoseEventStatus(str, enum.Enum):
+    taken = "taken"
+    late = "late"
+    missed = "missed"
+    skipped = "skipped"
+    dispensed = "dispensed"  # Saída registrada pelo POST /compartment/{id}/dispense
+
+
+class DoseEvent(SQLModel, table=True):
+    # Log append-only: chave inteira sequencial e índice pensado para range
+    # scans por senior no tempo. prescription/compartment ficam sem FK para o
+    # histórico sobreviver a exclusões e o insert não pagar a checagem.
+    __table_args__ = (
+        Index("ix_doseevent_senior_id_scheduled_at", "senior_id", "scheduled_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    senior_id: str = Field(foreign_key="senior.id")
+    device_id: str
+    compartment_id: Optional[str] = None
+    prescription_id: Optional[str] = None
+    scheduled_at: datetime
+    taken_at: Optional[datetime] = None
+    status: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,28 @@
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, Relationship, SQLModel
+
+if TYPE_CHECKING:
+    from .medication import Medication
+
+
+class DoseSchedule(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_doseschedule_senior_id_end_date", "senior_id", "end_date"),
+    )
+
+    id: str = Field(
+        default_factory=lambda: str(uuid.uuid4()), primary_key=True, index=True
+    )
+    prescription_id: str = Field(foreign_key="prescription.id", index=True)
+    senior_id: str = Field(foreign_key="senior.id")
+    medication_id: str = Field(foreign_key="medication.id")
+    kind: str  # "interval" ou "fixed"
+    interval_minutes: Optional[int] = None  # kind == "interval", ancorado em start_date
+    minute_of_day: Optional[int] = None  # kind == "fixed", 0..1439
+    start_date: datetime
+    end_date: datetime
+    medication: Optional["Medication"] = Relationship()
@@ -1,4 +1,5 @@
 import uuid
+from datetime import datetime
 from typing import TYPE_CHECKING, List, Optional
 
 from sqlmodel import Field, Relationship, SQLModel
@@ -14,4 +15,8 @@ class Medication(SQLModel, table=True):
     )
     name: str
     description: Optional[str] = None
+    # Entra no ETag de quem exibe nomes de medicação (ex.: dispenser)
+    updated_at: datetime = Field(
+        default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow}
+    )
     prescriptions: List["Prescription"] = Relationship(back_populates="medication")
@@ -2,14 +2,20 @@ import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING, List, Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
     from .medication import Medication
     from .senior import Senior
+    from .user import User
 
 
 class Prescription(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_prescription_senior_id_end_date", "senior_id", "end_date"),
+    )
+
     id: str = Field(
         default_factory=lambda: str(uuid.uuid4()), primary_key=True, index=True
     )
@@ -21,6 +27,11 @@ class Prescription(SQLModel, table=True):
     frequency: str
     start_date: datetime
     end_date: datetime
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    # Cursor do sync de devices: muda a cada UPDATE
+    updated_at: datetime = Field(
+        default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow}
+    )
     senior: Optional["Senior"] = Relationship(back_populates="prescriptions")
     medication: Optional["Medication"] = Relationship(back_populates="prescriptions")
+    doctor: Optional["User"] = Relationship()
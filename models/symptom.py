@@ -2,6 +2,7 @@ import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
@@ -9,6 +10,10 @@ if TYPE_CHECKING:
 
 
 class Symptom(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_symptom_senior_id_created_at", "senior_id", "created_at"),
+    )
+
     id: str = Field(
         default_factory=lambda: str(uuid.uuid4()), primary_key=True, index=True
     )
@@ -16,5 +21,5 @@ class Symptom(SQLModel, table=True):
     name: str
     description: str
     pain_level: int
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     senior: Optional["Senior"] = Relationship(back_populates="symptoms")
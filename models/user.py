@@ -22,4 +22,4 @@ class User(SQLModel, table=True):
     email: str = Field(unique=True, index=True)
     password: str
     role: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -1,7 +1,9 @@
 from .dispenser import router as dispenser
+from .events import router as events
 from .medications import router as medications
 from .prescriptions import router as prescriptions
 from .reports import router as reports
+from .schedule import router as schedule
 from .senior import router as senior
 from .symptoms import router as symptoms
 from .users import router as users
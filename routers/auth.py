@@ -2,51 +2,42 @@ from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from database import get_session
+from database import get_async_session, get_current_user_async
 from models.user import User
 from schemas.token import Token
 from schemas.user import UserCreate, UserRead  # UserLogin is not used directly
+from utils.hashing import get_password_hash, hash_metrics, verify_password
 from utils.jwt import create_access_token
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.exec(select(User).where(User.email == email))).first()
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
-
-
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.password):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
+    if not user or not await verify_password(password, user.password):
         return None
     return user
 
 
 @router.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_session)):
-    db_user = get_user_by_email(db, user.email)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_session)):
+    db_user = await get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     new_user = User(
         name=user.name, email=user.email, password=hashed_password, role=user.role
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     access_token = create_access_token(data={"sub": new_user.email})
     return {
         "access_token": access_token,
@@ -61,11 +52,12 @@ def register(user: UserCreate, db: Session = Depends(get_session)):
 
 
 @router.post("/login", response_model=Token)
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_session)
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_session),
 ):
     # Client sends email in 'username' field of OAuth2PasswordRequestForm
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     access_token = create_access_token(data={"sub": user.email})
@@ -79,3 +71,9 @@ def login(
             "role": user.role,
         },
     }
+
+
+@router.get("/metrics", dependencies=[Depends(get_current_user_async)])
+async def get_hash_metrics():
+    # Latência do bcrypt e espera na fila do pool de hashing
+    return hash_metrics.snapshot()
@@ -1,15 +1,67 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 
 from database import get_current_user, get_session
 from models.compartment import Compartment
-from schemas.compartment import CompartmentCreate, CompartmentRead, CompartmentUpdate
+from models.compartmentforecast import CompartmentForecast
+from models.device import Device
+from models.dispenser import Dispenser
+from models.doseevent import DoseEvent, DoseEventStatus
+from models.usersenior import UserSenior
+from schemas.compartment import (
+    CompartmentCreate,
+    CompartmentDispense,
+    CompartmentDispenseResult,
+    CompartmentForecastRead,
+    CompartmentRead,
+    CompartmentReplace,
+    CompartmentUpdate,
+)
+from utils.events import event_hub
+from utils.forecast import delete_forecast, refresh_forecasts
+from utils.medication_catalog import medication_catalog
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    apply_keyset,
+    split_page,
+)
 
 router = APIRouter()
 
 
+def publish_compartment_event(
+    db: Session, event_type: str, dispenser_id: str, **payload
+):
+    # Senior dono do dispenser só é consultado se houver alguém ouvindo
+    if not event_hub.active:
+        return
+    senior_id = (
+        db.query(Device.senior_id)
+        .join(Dispenser, Dispenser.device_id == Device.id)
+        .filter(Dispenser.id == dispenser_id)
+        .scalar()
+    )
+    if senior_id:
+        event_hub.publish(senior_id, event_type, dispenser_id=dispenser_id, **payload)
+
+
+def publish_compartment_written(db: Session, compartment: Compartment):
+    publish_compartment_event(
+        db,
+        "compartment.updated",
+        compartment.dispenser_id,
+        compartment_id=compartment.compartment_id,
+        medication_id=compartment.medication_id,
+        quantity=compartment.quantity,
+    )
+
+
 @router.post(
     "/", response_model=CompartmentRead, dependencies=[Depends(get_current_user)]
 )
@@ -18,16 +70,85 @@ def create_compartment(
 ):
     db_compartment = Compartment(**compartment.dict())
     db.add(db_compartment)
+    refresh_forecasts(db, [db_compartment])
     db.commit()
     db.refresh(db_compartment)
+    publish_compartment_written(db, db_compartment)
     return db_compartment
 
 
 @router.get(
     "/", response_model=List[CompartmentRead], dependencies=[Depends(get_current_user)]
 )
-def list_compartments(db: Session = Depends(get_session)):
-    return db.query(Compartment).all()
+def list_compartments(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    dispenser_id: Optional[str] = None,
+    medication_id: Optional[str] = None,
+    db: Session = Depends(get_session),
+):
+    query = db.query(Compartment)
+    if dispenser_id:
+        query = query.filter(Compartment.dispenser_id == dispenser_id)
+    if medication_id:
+        query = query.filter(Compartment.medication_id == medication_id)
+    keys = [Compartment.compartment_id]
+    rows = apply_keyset(query, keys, limit, after).all()
+    compartments, next_cursor = split_page(rows, keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return compartments
+
+
+def forecast_read_query(db: Session):
+    return db.query(CompartmentForecast).order_by(
+        CompartmentForecast.empty_at.is_(None), CompartmentForecast.empty_at
+    )
+
+
+def build_forecast_read(
+    forecast: CompartmentForecast, now: datetime
+) -> CompartmentForecastRead:
+    days_until_empty = None
+    if forecast.empty_at:
+        days_until_empty = round(
+            max((forecast.empty_at - now).total_seconds(), 0) / 86400, 2
+        )
+    return CompartmentForecastRead(
+        **forecast.dict(exclude={"computed_at"}),
+        medication_name=medication_catalog.name(forecast.medication_id),
+        days_until_empty=days_until_empty,
+    )
+
+
+@router.get(
+    "/forecast/by_dispenser/{dispenser_id}",
+    response_model=List[CompartmentForecastRead],
+    dependencies=[Depends(get_current_user)],
+)
+def get_forecast_by_dispenser(dispenser_id: str, db: Session = Depends(get_session)):
+    now = datetime.utcnow()
+    rows = forecast_read_query(db).filter(
+        CompartmentForecast.dispenser_id == dispenser_id
+    )
+    return [build_forecast_read(forecast, now) for forecast in rows]
+
+
+@router.get(
+    "/forecast/by_user/{user_id}",
+    response_model=List[CompartmentForecastRead],
+    dependencies=[Depends(get_current_user)],
+)
+def get_forecast_by_user(user_id: str, db: Session = Depends(get_session)):
+    # Todos os dispensers dos seniors do cuidador, ordenados pelo fim do estoque
+    now = datetime.utcnow()
+    rows = (
+        forecast_read_query(db)
+        .join(UserSenior, UserSenior.senior_id == CompartmentForecast.senior_id)
+        .filter(UserSenior.user_id == user_id)
+    )
+    return [build_forecast_read(forecast, now) for forecast in rows]
 
 
 @router.get(
@@ -46,28 +167,137 @@ def get_compartment(compartment_id: str, db: Session = Depends(get_session)):
     return compartment
 
 
+def conditional_update(
+    db: Session, compartment_id: str, values: dict, version: int = None
+) -> Compartment:
+    # Um único UPDATE ... RETURNING; com version, só aplica se ninguém escreveu antes
+    statement = update(Compartment).where(Compartment.compartment_id == compartment_id)
+    if version is not None:
+        statement = statement.where(Compartment.version == version)
+    compartment = db.scalars(
+        statement.values(**values, version=Compartment.version + 1).returning(
+            Compartment
+        )
+    ).first()
+    if compartment is None:
+        raise_missing_or_conflict(db, compartment_id, "Compartment version changed")
+    return compartment
+
+
+def raise_missing_or_conflict(db: Session, compartment_id: str, conflict: str):
+    exists = (
+        db.query(Compartment.compartment_id)
+        .filter(Compartment.compartment_id == compartment_id)
+        .first()
+    )
+    if not exists:
+        raise HTTPException(status_code=404, detail="Compartment not found")
+    raise HTTPException(status_code=409, detail=conflict)
+
+
+@router.post(
+    "/{compartment_id}/dispense",
+    response_model=CompartmentDispenseResult,
+    dependencies=[Depends(get_current_user)],
+)
+def dispense_compartment(
+    compartment_id: str,
+    payload: CompartmentDispense,
+    db: Session = Depends(get_session),
+):
+    # Decremento atômico no banco: sem ler antes, sem perder dispensas concorrentes
+    row = db.execute(
+        update(Compartment)
+        .where(
+            Compartment.compartment_id == compartment_id,
+            Compartment.quantity >= payload.quantity,
+        )
+        .values(
+            quantity=Compartment.quantity - payload.quantity,
+            version=Compartment.version + 1,
+        )
+        .returning(
+            Compartment.dispenser_id,
+            Compartment.medication_id,
+            Compartment.quantity,
+            Compartment.version,
+        )
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        raise_missing_or_conflict(db, compartment_id, "Insufficient quantity")
+    device = (
+        db.query(Device.id, Device.senior_id)
+        .join(Dispenser, Dispenser.device_id == Device.id)
+        .filter(Dispenser.id == row.dispenser_id)
+        .first()
+    )
+    if not device:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Device not found")
+    now = datetime.utcnow()
+    dose_event_id = db.execute(
+        insert(DoseEvent)
+        .values(
+            senior_id=device.senior_id,
+            device_id=device.id,
+            compartment_id=compartment_id,
+            prescription_id=payload.prescription_id,
+            scheduled_at=payload.scheduled_at or now,
+            taken_at=now,
+            status=DoseEventStatus.dispensed.value,
+            created_at=now,
+        )
+        .returning(DoseEvent.id)
+    ).scalar_one()
+    # Previsão recalculada a partir do RETURNING, sem reler o compartimento
+    refresh_forecasts(
+        db,
+        [
+            Compartment(
+                compartment_id=compartment_id,
+                dispenser_id=row.dispenser_id,
+                medication_id=row.medication_id,
+                quantity=row.quantity,
+            )
+        ],
+        now,
+    )
+    db.commit()
+    event_hub.publish(
+        device.senior_id,
+        "compartment.dispensed",
+        dispenser_id=row.dispenser_id,
+        compartment_id=compartment_id,
+        quantity=row.quantity,
+        dispensed=payload.quantity,
+    )
+    return {
+        "compartment_id": compartment_id,
+        "quantity": row.quantity,
+        "version": row.version,
+        "dose_event_id": dose_event_id,
+    }
+
+
 @router.patch(
     "/{compartment_id}",
     response_model=CompartmentRead,
     dependencies=[Depends(get_current_user)],
 )
 def update_compartment_quantity(
-    compartment_id: str, update: CompartmentUpdate, db: Session = Depends(get_session)
+    compartment_id: str,
+    payload: CompartmentUpdate,
+    db: Session = Depends(get_session),
 ):
-    compartment = (
-        db.query(Compartment)
-        .filter(Compartment.compartment_id == compartment_id)
-        .first()
-    )
-    if not compartment:
-        raise HTTPException(status_code=404, detail="Compartment not found")
     # Atualiza quantity e medication_id se fornecidos
-    if hasattr(update, "quantity") and update.quantity is not None:
-        compartment.quantity = update.quantity
-    if hasattr(update, "medication_id") and update.medication_id is not None:
-        compartment.medication_id = update.medication_id
+    values = payload.dict(exclude={"version"}, exclude_none=True)
+    compartment = conditional_update(db, compartment_id, values, payload.version)
+    # Atualização incremental: só a previsão deste compartimento
+    refresh_forecasts(db, [compartment])
     db.commit()
     db.refresh(compartment)
+    publish_compartment_written(db, compartment)
     return compartment
 
 
@@ -78,20 +308,19 @@ def update_compartment_quantity(
 )
 def update_compartment(
     compartment_id: str,
-    compartment: CompartmentCreate,
+    compartment: CompartmentReplace,
     db: Session = Depends(get_session),
 ):
-    db_compartment = (
-        db.query(Compartment)
-        .filter(Compartment.compartment_id == compartment_id)
-        .first()
+    db_compartment = conditional_update(
+        db,
+        compartment_id,
+        compartment.dict(exclude={"version"}),
+        compartment.version,
     )
-    if not db_compartment:
-        raise HTTPException(status_code=404, detail="Compartment not found")
-    for key, value in compartment.dict().items():
-        setattr(db_compartment, key, value)
+    refresh_forecasts(db, [db_compartment])
     db.commit()
     db.refresh(db_compartment)
+    publish_compartment_written(db, db_compartment)
     return db_compartment
 
 
@@ -106,6 +335,11 @@ def delete_compartment(compartment_id: str, db: Session = Depends(get_session)):
     )
     if not compartment:
         raise HTTPException(status_code=404, detail="Compartment not found")
+    dispenser_id = compartment.dispenser_id
+    delete_forecast(db, compartment_id)
     db.delete(compartment)
     db.commit()
+    publish_compartment_event(
+        db, "compartment.deleted", dispenser_id, compartment_id=compartment_id
+    )
     return
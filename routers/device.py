@@ -1,74 +1,296 @@
-from datetime import datetime
-from typing import List, Optional
+import uuid
+from datetime import date, datetime
+from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from database import get_current_user, get_session
+from database import get_async_session, get_current_user_async
 from models.compartment import Compartment
 from models.device import Device
 from models.dispenser import Dispenser
+from models.doseevent import DoseEvent, DoseEventStatus
+from models.prescription import Prescription
+from models.symptom import Symptom
+from routers.prescriptions import build_prescription_reads, prescription_read_select
+from routers.reports import report_cache
+from schemas.doseevent import DoseEventCreate
+from schemas.sync import DeviceSyncRequest, DeviceSyncResponse
+from utils.events import event_hub
+from utils.forecast import refresh_compartment_forecasts
+from utils.medication_catalog import medication_catalog
+from utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter()
 
 
-def get_dispenser_overview(dispenser: Dispenser, db: Session) -> dict:
-    from models.medication import Medication
+def dispenser_overview_select():
+    # Compartimentos num SELECT ... IN; nomes de medicação vêm do catálogo
+    return select(Dispenser).options(selectinload(Dispenser.compartments))
 
+
+def device_overview_select():
+    # Rotas async não podem fazer lazy load: dispenser e compartments vêm junto
+    return select(Device).options(
+        selectinload(Device.dispenser).selectinload(Dispenser.compartments)
+    )
+
+
+def get_compartment_data(c: Compartment) -> dict:
+    return {
+        "compartment_id": c.compartment_id,
+        "dispenser_id": c.dispenser_id,
+        "medication_id": c.medication_id,
+        "medication_name": medication_catalog.name(c.medication_id),
+        "quantity": c.quantity,
+    }
+
+
+def get_dispenser_overview(dispenser: Dispenser) -> dict:
+    # Espera compartments já carregados (dispenser_overview_select)
     return {
         "id": dispenser.id,
         "device_id": dispenser.device_id,
-        "compartments": [
-            {
-                "compartment_id": c.compartment_id,
-                "dispenser_id": c.dispenser_id,
-                "medication_id": c.medication_id,
-                "medication_name": (
-                    db.query(Medication)
-                    .filter(Medication.id == c.medication_id)
-                    .first()
-                    .name
-                    if c.medication_id
-                    and db.query(Medication)
-                    .filter(Medication.id == c.medication_id)
-                    .first()
-                    is not None
-                    else None
-                ),
-                "quantity": c.quantity,
-            }
-            for c in dispenser.compartments
-        ],
+        "compartments": [get_compartment_data(c) for c in dispenser.compartments],
     }
 
 
-@router.get("/{device_id}", dependencies=[Depends(get_current_user)])
-def get_device_overview(device_id: str, db: Session = Depends(get_session)):
-    device = db.query(Device).filter(Device.id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
+def get_device_data(device: Device) -> dict:
     dispenser = device.dispenser
-    dispenser_data = get_dispenser_overview(dispenser, db) if dispenser else None
     return {
         "id": device.id,
         "senior_id": device.senior_id,
         "status": device.status,
         "last_sync": device.last_sync,
-        "dispenser": dispenser_data,
+        "dispenser": get_dispenser_overview(dispenser) if dispenser else None,
     }
 
 
-@router.get("/by_senior/{senior_id}", dependencies=[Depends(get_current_user)])
-def get_device_by_senior(senior_id: str, db: Session = Depends(get_session)):
-    device = db.query(Device).filter(Device.senior_id == senior_id).first()
+@router.get("/{device_id}", dependencies=[Depends(get_current_user_async)])
+async def get_device_overview(
+    device_id: str, db: AsyncSession = Depends(get_async_session)
+):
+    device = (
+        await db.exec(device_overview_select().where(Device.id == device_id))
+    ).first()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return get_device_data(device)
+
+
+@router.get("/by_senior/{senior_id}", dependencies=[Depends(get_current_user_async)])
+async def get_device_by_senior(
+    senior_id: str, db: AsyncSession = Depends(get_async_session)
+):
+    device = (
+        await db.exec(device_overview_select().where(Device.senior_id == senior_id))
+    ).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found for this senior")
-    dispenser = device.dispenser
-    dispenser_data = get_dispenser_overview(dispenser, db) if dispenser else None
+    return get_device_data(device)
+
+
+def get_dose_event_rows(device: Device, events: list, received_at: datetime) -> list:
+    return [
+        {
+            "senior_id": device.senior_id,
+            "device_id": device.id,
+            "compartment_id": e.compartment_id,
+            "prescription_id": e.prescription_id,
+            "scheduled_at": e.scheduled_at,
+            "taken_at": e.taken_at,
+            "status": e.status.value,
+            "created_at": received_at,
+        }
+        for e in events
+    ]
+
+
+@router.post(
+    "/{device_id}/dose_events",
+    status_code=201,
+    dependencies=[Depends(get_current_user_async)],
+)
+async def ingest_dose_events(
+    device_id: str,
+    events: List[DoseEventCreate],
+    db: AsyncSession = Depends(get_async_session),
+):
+    device = (await db.exec(select(Device).where(Device.id == device_id))).first()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    if events:
+        # Lote inteiro num único executemany
+        await db.exec(
+            insert(DoseEvent),
+            params=get_dose_event_rows(device, events, datetime.utcnow()),
+        )
+        await db.commit()
+        report_cache.invalidate_tag(device.senior_id)
+    return {"inserted": len(events)}
+
+
+async def apply_dispense_events(
+    db: AsyncSession, device: Device, events: list, received_at: datetime
+) -> list:
+    # Um UPDATE condicional com RETURNING por evento, como o POST
+    # /compartment/{id}/dispense: o device sabe qual saída não foi aplicada, e
+    # cada saída aplicada vira um DoseEvent 'dispensed'
+    compartment = Compartment.__table__.c
+    results = []
+    dose_events = []
+    for index, e in enumerate(events):
+        result = {"index": index, "compartment_id": e.compartment_id}
+        results.append(result)
+        if not device.dispenser:
+            result["error"] = "Device has no dispenser"
+            continue
+        in_dispenser = (compartment.compartment_id == e.compartment_id) & (
+            compartment.dispenser_id == device.dispenser.id
+        )
+        row = (
+            await db.exec(
+                update(Compartment.__table__)
+                .where(in_dispenser, compartment.quantity >= e.quantity)
+                .values(
+                    quantity=compartment.quantity - e.quantity,
+                    version=compartment.version + 1,
+                )
+                .returning(compartment.quantity, compartment.version)
+            )
+        ).first()
+        if row is None:
+            exists = (
+                await db.exec(select(compartment.compartment_id).where(in_dispenser))
+            ).first()
+            result["error"] = (
+                "Insufficient quantity" if exists else "Compartment not found"
+            )
+            continue
+        result["quantity"], result["version"] = row.quantity, row.version
+        dispensed_at = e.dispensed_at or received_at
+        dose_events.append(
+            {
+                "senior_id": device.senior_id,
+                "device_id": device.id,
+                "compartment_id": e.compartment_id,
+                "prescription_id": e.prescription_id,
+                "scheduled_at": e.scheduled_at or dispensed_at,
+                "taken_at": dispensed_at,
+                "status": DoseEventStatus.dispensed.value,
+                "created_at": received_at,
+            }
+        )
+    if dose_events:
+        await db.exec(insert(DoseEvent), params=dose_events)
+        # Estoque mudou: previsões recalculadas na mesma transação
+        await db.run_sync(
+            refresh_compartment_forecasts,
+            {event["compartment_id"] for event in dose_events},
+        )
+    return results
+
+
+@router.post(
+    "/{device_id}/sync",
+    response_model=DeviceSyncResponse,
+    dependencies=[Depends(get_current_user_async)],
+)
+async def sync_device(
+    device_id: str,
+    payload: DeviceSyncRequest,
+    db: AsyncSession = Depends(get_async_session),
+):
+    device = (
+        await db.exec(
+            select(Device)
+            .options(selectinload(Device.dispenser))
+            .where(Device.id == device_id)
+        )
+    ).first()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    since = (
+        decode_cursor(payload.cursor, [Prescription.updated_at])[0]
+        if payload.cursor
+        else None
+    )
+    now = datetime.utcnow()
+
+    # Eventos do device: executemany para sintomas e doses; saídas uma a uma
+    if payload.symptoms:
+        await db.exec(
+            insert(Symptom),
+            params=[
+                {
+                    "id": str(uuid.uuid4()),
+                    "senior_id": device.senior_id,
+                    "name": s.name,
+                    "description": s.description,
+                    "pain_level": s.pain_level,
+                    "created_at": s.created_at or now,
+                }
+                for s in payload.symptoms
+            ],
+        )
+    dispense_results = await apply_dispense_events(
+        db, device, payload.dispense_events, now
+    )
+    dispensed_ids = sorted(
+        {r["compartment_id"] for r in dispense_results if "error" not in r}
+    )
+    if payload.dose_events:
+        await db.exec(
+            insert(DoseEvent),
+            params=get_dose_event_rows(device, payload.dose_events, now),
+        )
+    device.last_sync = now
+    await db.commit()
+    if payload.symptoms or payload.dose_events or dispensed_ids:
+        report_cache.invalidate_tag(device.senior_id)
+    if payload.symptoms or dispensed_ids:
+        event_hub.publish(
+            device.senior_id,
+            "device.synced",
+            device_id=device.id,
+            symptoms=len(payload.symptoms),
+            compartment_ids=dispensed_ids,
+        )
+
+    # Só o que mudou desde o cursor
+    active = (Prescription.senior_id == device.senior_id) & (
+        Prescription.end_date >= date.today()
+    )
+    changed_prescriptions = prescription_read_select().where(active)
+    if since:
+        changed_prescriptions = changed_prescriptions.where(
+            Prescription.updated_at > since
+        )
+    prescriptions = (await db.exec(changed_prescriptions)).all()
+    active_ids = (await db.exec(select(Prescription.id).where(active))).all()
+    compartments = []
+    if device.dispenser:
+        changed_compartments = select(Compartment).where(
+            Compartment.dispenser_id == device.dispenser.id
+        )
+        if since:
+            changed_compartments = changed_compartments.where(
+                Compartment.updated_at > since
+            )
+        compartments = (await db.exec(changed_compartments)).all()
+    # Cursor = maior updated_at devolvido, nunca o relógio do início do request:
+    # linhas commitadas por outros requests depois dele ficariam para trás
+    cursor = max(
+        [p.updated_at for p in prescriptions] + [c.updated_at for c in compartments],
+        default=since,
+    )
     return {
-        "id": device.id,
-        "senior_id": device.senior_id,
-        "status": device.status,
-        "last_sync": device.last_sync,
-        "dispenser": dispenser_data,
+        "cursor": encode_cursor([cursor]) if cursor else None,
+        "prescriptions": await db.run_sync(build_prescription_reads, prescriptions),
+        "active_prescription_ids": active_ids,
+        "compartments": [get_compartment_data(c) for c in compartments],
+        "dispense_results": dispense_results,
     }
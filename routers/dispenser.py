@@ -1,114 +1,267 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from database import get_current_user, get_session
+from database import get_async_session, get_current_user_async
+from models.compartment import Compartment
 from models.device import Device
 from models.dispenser import Dispenser
-from schemas.dispenser import DispenserCreate, DispenserRead
+from models.medication import Medication
+from routers.device import dispenser_overview_select, get_dispenser_overview
+from schemas.dispenser import CompartmentSlot, DispenserCreate, DispenserRead
+from utils.etag import etag_matches, make_etag, not_modified
+from utils.events import event_hub
+from utils.forecast import refresh_compartment_forecasts
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    apply_keyset,
+    split_page,
+)
 
 router = APIRouter()
 
 
-@router.get("/by_device/{device_id}", dependencies=[Depends(get_current_user)])
-def get_dispenser_content(device_id: str, db: Session = Depends(get_session)):
-    device = db.query(Device).filter(Device.id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    dispenser = device.dispenser
+async def get_dispenser_or_404(db: AsyncSession, dispenser_id: str) -> Dispenser:
+    dispenser = (
+        await db.exec(
+            select(Dispenser)
+            .options(selectinload(Dispenser.compartments))
+            .where(Dispenser.id == dispenser_id)
+        )
+    ).first()
+    if not dispenser:
+        raise HTTPException(status_code=404, detail="Dispenser not found")
+    return dispenser
+
+
+async def get_compartments_version(db: AsyncSession, device_id: str):
+    # Versão barata do conteúdo, só com estado do banco (igual em todo worker):
+    # contagem + último updated_at dos compartimentos e das medicações exibidas
+    # (a contagem destas pega medicação excluída)
+    count, updated_at, medications, medications_updated_at = (
+        await db.exec(
+            select(
+                func.count(Compartment.compartment_id),
+                func.max(Compartment.updated_at),
+                func.count(Medication.id),
+                func.max(Medication.updated_at),
+            )
+            .join(Dispenser, Dispenser.id == Compartment.dispenser_id)
+            .outerjoin(Medication, Medication.id == Compartment.medication_id)
+            .where(Dispenser.device_id == device_id)
+        )
+    ).one()
+    if not count:
+        return None
+    key = f"{device_id}:{count}:{updated_at}:{medications}:{medications_updated_at}"
+    return make_etag(key.encode())
+
+
+async def get_dispenser_content_by_device(
+    db: AsyncSession, device_id: str, request: Request, response: Response
+):
+    etag = await get_compartments_version(db, device_id)
+    if etag:
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+    dispenser = (
+        await db.exec(
+            dispenser_overview_select().where(Dispenser.device_id == device_id)
+        )
+    ).first()
     if not dispenser:
         raise HTTPException(status_code=404, detail="Dispenser not found")
-    compartments = [
-        {
-            "compartment_id": c.compartment_id,
-            "medication_name": c.medication.name if c.medication else None,
-            "quantity": c.quantity,
-        }
-        for c in dispenser.compartments
-    ]
-    return compartments
-
-
-@router.get("/by_senior/{senior_id}", dependencies=[Depends(get_current_user)])
-def get_dispenser_by_senior(senior_id: str, db: Session = Depends(get_session)):
+    return get_dispenser_overview(dispenser)["compartments"]
+
+
+@router.get("/by_device/{device_id}", dependencies=[Depends(get_current_user_async)])
+async def get_dispenser_content(
+    device_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+):
+    device = (await db.exec(select(Device.id).where(Device.id == device_id))).first()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return await get_dispenser_content_by_device(db, device_id, request, response)
+
+
+@router.get("/by_senior/{senior_id}", dependencies=[Depends(get_current_user_async)])
+async def get_dispenser_by_senior(
+    senior_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+):
     from models.senior import Senior
 
-    senior = db.query(Senior).filter(Senior.id == senior_id).first()
+    senior = (await db.exec(select(Senior.id).where(Senior.id == senior_id))).first()
     if not senior:
         raise HTTPException(status_code=404, detail="Senior not found")
-    device = senior.device
-    if not device:
+    device_id = (
+        await db.exec(select(Device.id).where(Device.senior_id == senior_id))
+    ).first()
+    if not device_id:
         raise HTTPException(status_code=404, detail="Device not found")
-    dispenser = device.dispenser
-    if not dispenser:
-        raise HTTPException(status_code=404, detail="Dispenser not found")
-    compartments = [
-        {
-            "compartment_id": c.compartment_id,
-            "medication_name": c.medication.name if c.medication else None,
-            "quantity": c.quantity,
-        }
-        for c in dispenser.compartments
-    ]
-    return compartments
+    return await get_dispenser_content_by_device(db, device_id, request, response)
 
 
 @router.post(
-    "/", response_model=DispenserRead, dependencies=[Depends(get_current_user)]
+    "/", response_model=DispenserRead, dependencies=[Depends(get_current_user_async)]
 )
-def create_dispenser(dispenser: DispenserCreate, db: Session = Depends(get_session)):
+async def create_dispenser(
+    dispenser: DispenserCreate, db: AsyncSession = Depends(get_async_session)
+):
     db_dispenser = Dispenser(**dispenser.dict())
     db.add(db_dispenser)
-    db.commit()
-    db.refresh(db_dispenser)
+    await db.commit()
+    await db.refresh(db_dispenser, ["compartments"])
     return db_dispenser
 
 
 @router.get(
-    "/", response_model=List[DispenserRead], dependencies=[Depends(get_current_user)]
+    "/",
+    response_model=List[DispenserRead],
+    dependencies=[Depends(get_current_user_async)],
 )
-def list_dispensers(db: Session = Depends(get_session)):
-    return db.query(Dispenser).all()
+async def list_dispensers(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    device_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_session),
+):
+    statement = select(Dispenser).options(selectinload(Dispenser.compartments))
+    if device_id:
+        statement = statement.where(Dispenser.device_id == device_id)
+    keys = [Dispenser.id]
+    rows = (await db.exec(apply_keyset(statement, keys, limit, after))).all()
+    dispensers, next_cursor = split_page(rows, keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return dispensers
 
 
 @router.get(
     "/{dispenser_id}",
     response_model=DispenserRead,
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(get_current_user_async)],
 )
-def get_dispenser(dispenser_id: str, db: Session = Depends(get_session)):
-    dispenser = db.query(Dispenser).filter(Dispenser.id == dispenser_id).first()
-    if not dispenser:
-        raise HTTPException(status_code=404, detail="Dispenser not found")
-    return dispenser
+async def get_dispenser(
+    dispenser_id: str, db: AsyncSession = Depends(get_async_session)
+):
+    return await get_dispenser_or_404(db, dispenser_id)
 
 
 @router.put(
     "/{dispenser_id}",
     response_model=DispenserRead,
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(get_current_user_async)],
 )
-def update_dispenser(
-    dispenser_id: str, dispenser: DispenserCreate, db: Session = Depends(get_session)
+async def update_dispenser(
+    dispenser_id: str,
+    dispenser: DispenserCreate,
+    db: AsyncSession = Depends(get_async_session),
 ):
-    db_dispenser = db.query(Dispenser).filter(Dispenser.id == dispenser_id).first()
-    if not db_dispenser:
-        raise HTTPException(status_code=404, detail="Dispenser not found")
+    db_dispenser = await get_dispenser_or_404(db, dispenser_id)
     for key, value in dispenser.dict().items():
         setattr(db_dispenser, key, value)
-    db.commit()
-    db.refresh(db_dispenser)
+    await db.commit()
     return db_dispenser
 
 
+@router.put(
+    "/{dispenser_id}/compartments", dependencies=[Depends(get_current_user_async)]
+)
+async def replace_dispenser_compartments(
+    dispenser_id: str,
+    slots: List[CompartmentSlot],
+    db: AsyncSession = Depends(get_async_session),
+):
+    # Recarga do dispenser inteiro: valida tudo antes, aplica num único UPDATE
+    dispenser = await get_dispenser_or_404(db, dispenser_id)
+    compartment_ids = [slot.compartment_id for slot in slots]
+    if len(set(compartment_ids)) != len(compartment_ids):
+        raise HTTPException(status_code=400, detail="Duplicate compartment_id.")
+    unknown = set(compartment_ids) - {c.compartment_id for c in dispenser.compartments}
+    if unknown:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Compartments not in dispenser: {', '.join(sorted(unknown))}",
+        )
+    medication_ids = {slot.medication_id for slot in slots if slot.medication_id}
+    if medication_ids:
+        found = await db.exec(
+            select(Medication.id).where(Medication.id.in_(medication_ids))
+        )
+        missing = medication_ids - set(found.all())
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Medications not found: {', '.join(sorted(missing))}",
+            )
+
+    if slots:
+        compartment = Compartment.__table__.c
+        await db.exec(
+            update(Compartment.__table__)
+            .where(
+                compartment.compartment_id == bindparam("slot_compartment_id"),
+                compartment.dispenser_id == dispenser_id,
+            )
+            .values(
+                medication_id=bindparam("slot_medication_id"),
+                quantity=bindparam("slot_quantity"),
+                version=compartment.version + 1,
+            ),
+            params=[
+                {
+                    "slot_compartment_id": slot.compartment_id,
+                    "slot_medication_id": slot.medication_id,
+                    "slot_quantity": slot.quantity,
+                }
+                for slot in slots
+            ],
+        )
+        await db.run_sync(refresh_compartment_forecasts, compartment_ids)
+        await db.commit()
+
+    # O UPDATE em Core não atualiza os objetos já carregados na sessão
+    dispenser = (
+        await db.exec(
+            dispenser_overview_select()
+            .where(Dispenser.id == dispenser_id)
+            .execution_options(populate_existing=True)
+        )
+    ).one()
+    senior_id = (
+        await db.exec(select(Device.senior_id).where(Device.id == dispenser.device_id))
+    ).first()
+    if slots and senior_id:
+        event_hub.publish(
+            senior_id,
+            "compartments.updated",
+            dispenser_id=dispenser_id,
+            compartment_ids=compartment_ids,
+        )
+    return get_dispenser_overview(dispenser)
+
+
 @router.delete(
-    "/{dispenser_id}", status_code=204, dependencies=[Depends(get_current_user)]
+    "/{dispenser_id}", status_code=204, dependencies=[Depends(get_current_user_async)]
 )
-def delete_dispenser(dispenser_id: str, db: Session = Depends(get_session)):
-    dispenser = db.query(Dispenser).filter(Dispenser.id == dispenser_id).first()
-    if not dispenser:
-        raise HTTPException(status_code=404, detail="Dispenser not found")
-    db.delete(dispenser)
-    db.commit()
+async def delete_dispenser(
+    dispenser_id: str, db: AsyncSession = Depends(get_async_session)
+):
+    dispenser = await get_dispenser_or_404(db, dispenser_id)
+    await db.delete(dispenser)
+    await db.commit()
     return
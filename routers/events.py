@@ -0,0 +1,65 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import async_engine, get_user_by_token_async
+from models.device import Device
+from utils.events import event_hub
+
+router = APIRouter()
+
+
+async def _authorize(token: str, device_id: str = None) -> tuple:
+    # WebSocket não manda Authorization no navegador: o JWT vem em ?token=.
+    # Sessão própria e curta: não segura conexão do pool enquanto o socket vive.
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        try:
+            await get_user_by_token_async(token, db)
+        except HTTPException:
+            return None, False
+        if device_id is None:
+            return None, True
+        senior_id = (
+            await db.exec(select(Device.senior_id).where(Device.id == device_id))
+        ).first()
+        return senior_id, True
+
+
+async def _stream_events(websocket: WebSocket, senior_id: str):
+    await websocket.accept()
+    queue = event_hub.subscribe(senior_id)
+
+    async def pump():
+        while True:
+            await websocket.send_json(await queue.get())
+
+    sender = asyncio.create_task(pump())
+    try:
+        # Só lê para notar a desconexão; mensagens do cliente são ignoradas
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        event_hub.unsubscribe(senior_id, queue)
+
+
+@router.websocket("/by_senior/{senior_id}")
+async def senior_events(websocket: WebSocket, senior_id: str, token: str = ""):
+    _, authorized = await _authorize(token)
+    if not authorized:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await _stream_events(websocket, senior_id)
+
+
+@router.websocket("/by_device/{device_id}")
+async def device_events(websocket: WebSocket, device_id: str, token: str = ""):
+    senior_id, authorized = await _authorize(token, device_id)
+    if not authorized or not senior_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await _stream_events(websocket, senior_id)
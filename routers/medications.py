@@ -1,15 +1,24 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from database import get_current_user, get_session
 from models.medication import Medication
 from models.user import User
-from routers.prescriptions import get_current_user
+from routers.prescriptions import device_snapshots
+from routers.reports import report_cache
 from schemas.medication import MedicationCreate, MedicationRead
 from utils.jwt import decode_access_token
+from utils.medication_catalog import medication_catalog
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    apply_keyset,
+    split_page,
+)
 
 router = APIRouter()
 
@@ -38,6 +47,7 @@ def create_medication(
     db_med = Medication(**medication.dict())
     db.add(db_med)
     db.commit()
+    medication_catalog.load(db)
     db.refresh(db_med)
     return db_med
 
@@ -46,9 +56,34 @@ def create_medication(
     "/", response_model=List[MedicationRead], dependencies=[Depends(get_current_user)]
 )
 def list_medications(
-    db: Session = Depends(get_session), current_user: User = Depends(get_current_user)
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    name: Optional[str] = None,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    query = db.query(Medication)
+    if name:
+        query = query.filter(Medication.name.startswith(name))
+    keys = [Medication.id]
+    rows = apply_keyset(query, keys, limit, after).all()
+    medications, next_cursor = split_page(rows, keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return medications
+
+
+@router.get(
+    "/search",
+    response_model=List[MedicationRead],
+    dependencies=[Depends(get_current_user)],
+)
+def search_medications(
+    q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100)
 ):
-    return db.query(Medication).all()
+    # Autocomplete sem ir ao banco: prefixo de qualquer palavra, sem acento/caixa
+    return medication_catalog.search(q, limit)
 
 
 @router.get(
@@ -76,6 +111,9 @@ def delete_medication(
     medication = get_medication_or_404(db, medication_id, current_user.id)
     db.delete(medication)
     db.commit()
+    medication_catalog.load(db)
+    device_snapshots.clear()
+    report_cache.clear()
     return
 
 
@@ -94,5 +132,9 @@ def update_medication(
     db_med.name = medication.name
     db_med.description = medication.description
     db.commit()
+    medication_catalog.load(db)
+    # Snapshots de prescrição trazem o nome do medicamento
+    device_snapshots.clear()
+    report_cache.clear()
     db.refresh(db_med)
     return db_med
@@ -1,19 +1,109 @@
-from datetime import datetime
-from typing import List
+from collections import defaultdict
+from datetime import date, datetime
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from database import get_current_user, get_session
+from database import (
+    get_async_session,
+    get_current_user,
+    get_current_user_async,
+    get_session,
+)
+from models.device import Device
 from models.medication import Medication
 from models.prescription import Prescription
 from models.user import User
-from schemas.prescription import PrescriptionCreate, PrescriptionRead
+from routers.reports import report_cache
+from schemas.prescription import (
+    PrescriptionBulkItem,
+    PrescriptionBulkResult,
+    PrescriptionCreate,
+    PrescriptionRead,
+)
+from utils.cache import TaggedCache
+from utils.dose_schedule import (
+    delete_dose_schedule,
+    replace_dose_schedule,
+    replace_dose_schedules,
+)
+from utils.etag import etag_matches, make_etag, not_modified
+from utils.events import event_hub
+from utils.export import stream_export
+from utils.forecast import refresh_senior_forecasts
 from utils.jwt import decode_access_token
+from utils.medication_catalog import medication_catalog
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    apply_keyset,
+    split_page,
+)
+from utils.serialization import dump_json_list, json_list_response
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+# Prescrições ativas por (device_id, dia), com a tag do senior
+device_snapshots = TaggedCache(maxsize=10000, ttl=60)
+
+
+def prescription_read_query(db: Session):
+    # Doctor em lote (uma query, não uma por linha); medication vem do catálogo
+    return db.query(Prescription).options(selectinload(Prescription.doctor))
+
+
+def get_missing_medications(db: Session, prescriptions: list) -> dict:
+    # Catálogo sem o ID (criado em outro worker, recarga ainda em andamento):
+    # um único IN no banco para os que faltam, em vez de resposta sem medication
+    missing = {
+        p.medication_id
+        for p in prescriptions
+        if medication_catalog.get(p.medication_id) is None
+    }
+    if not missing:
+        return {}
+    return {
+        m.id: {"id": m.id, "name": m.name, "description": m.description}
+        for m in db.query(Medication).filter(Medication.id.in_(missing))
+    }
+
+
+def build_prescription_read(
+    presc: Prescription, medications: Optional[dict] = None
+) -> PrescriptionRead:
+    medication_data = medication_catalog.get(presc.medication_id)
+    if medication_data is None and medications:
+        medication_data = medications.get(presc.medication_id)
+    doctor = presc.doctor
+    doctor_data = None
+    if doctor:
+        doctor_data = {"id": doctor.id, "name": doctor.name}
+    presc_data = {
+        **presc.__dict__,
+        "medication": medication_data,
+        "doctor": doctor_data,
+    }
+    return PrescriptionRead(**presc_data)
+
+
+def build_prescription_reads(db: Session, prescriptions: list) -> list:
+    # Em rotas async: await db.run_sync(build_prescription_reads, prescriptions)
+    medications = get_missing_medications(db, prescriptions)
+    return [build_prescription_read(p, medications) for p in prescriptions]
+
+
+def get_prescription_read(db: Session, prescription_id: str) -> PrescriptionRead:
+    prescription = (
+        prescription_read_query(db).filter(Prescription.id == prescription_id).first()
+    )
+    if not prescription:
+        raise HTTPException(status_code=404, detail="Prescription not found")
+    return build_prescription_reads(db, [prescription])[0]
 
 
 @router.post(
@@ -71,61 +161,212 @@ def create_prescription(
         description=prescription.description,
     )
     db.add(db_prescription)
+    # Materializa a agenda de doses na mesma transação
+    replace_dose_schedule(db, db_prescription)
+    refresh_senior_forecasts(db, [prescription.senior_id])
     db.commit()
+    device_snapshots.invalidate_tag(prescription.senior_id)
+    report_cache.invalidate_tag(prescription.senior_id)
     db.refresh(db_prescription)
-    # Monta resposta com medication e doctor
-    med = (
-        db.query(Medication)
-        .filter(Medication.id == db_prescription.medication_id)
-        .first()
+    event_hub.publish(
+        prescription.senior_id,
+        "prescription.created",
+        prescription_id=db_prescription.id,
+        medication_id=db_prescription.medication_id,
     )
-    medication_data = None
-    if med:
-        medication_data = {
-            "id": med.id,
-            "name": med.name,
-            "description": med.description,
-        }
-    doctor = db.query(User).filter(User.id == db_prescription.doctor_id).first()
-    doctor_data = None
-    if doctor:
-        doctor_data = {"id": doctor.id, "name": doctor.name}
-    presc_data = {
-        **db_prescription.__dict__,
-        "medication": medication_data,
-        "doctor": doctor_data,
+    # Monta resposta com medication e doctor
+    return get_prescription_read(db, db_prescription.id)
+
+
+def _parse_iso_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+@router.post(
+    "/bulk",
+    response_model=List[PrescriptionBulkResult],
+    dependencies=[Depends(get_current_user)],
+)
+def bulk_upsert_prescriptions(
+    items: List[PrescriptionBulkItem],
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    from models.senior import Senior
+
+    # Uma query IN por entidade referenciada, para o lote inteiro
+    senior_ids = {
+        row.id
+        for row in db.query(Senior.id).filter(
+            Senior.id.in_({item.senior_id for item in items})
+        )
     }
-    return PrescriptionRead(**presc_data)
+    # Linhas completas: servem de reserva se o catálogo ainda não tiver o ID
+    medications = {
+        m.id: {"id": m.id, "name": m.name, "description": m.description}
+        for m in db.query(Medication).filter(
+            Medication.id.in_({item.medication_id for item in items})
+        )
+    }
+    doctors = {
+        user.id: user
+        for user in db.query(User).filter(
+            User.id.in_({item.doctor_id for item in items}), User.role == "doctor"
+        )
+    }
+    update_ids = {item.id for item in items if item.id}
+    existing = (
+        {
+            presc.id: presc
+            for presc in db.query(Prescription).filter(Prescription.id.in_(update_ids))
+        }
+        if update_ids
+        else {}
+    )
+
+    results = []
+    written = []
+    # senior -> prescrições que chegaram nele ou saíram dele neste lote
+    affected_seniors = defaultdict(list)
+    for index, item in enumerate(items):
+        error = None
+        if item.senior_id not in senior_ids:
+            error = "Senior not found."
+        elif item.medication_id not in medications:
+            error = "Medication not found."
+        elif item.doctor_id not in doctors:
+            error = "Doctor not found or not a doctor."
+        elif item.id and item.id not in existing:
+            error = "Prescription not found."
+        else:
+            try:
+                start_date = _parse_iso_datetime(item.start_date)
+                end_date = _parse_iso_datetime(item.end_date)
+            except (TypeError, ValueError):
+                error = "Invalid date format. Use ISO 8601."
+        if error:
+            results.append({"index": index, "error": error})
+            continue
+        if item.id:
+            db_prescription = existing[item.id]
+            if db_prescription.senior_id != item.senior_id:
+                affected_seniors[db_prescription.senior_id].append(item.id)
+        else:
+            db_prescription = Prescription()
+            db.add(db_prescription)
+        db_prescription.senior_id = item.senior_id
+        db_prescription.medication_id = item.medication_id
+        db_prescription.doctor_id = item.doctor_id
+        db_prescription.dosage = item.dosage
+        db_prescription.frequency = item.frequency
+        db_prescription.start_date = start_date
+        db_prescription.end_date = end_date
+        db_prescription.description = item.description
+        # Doctor já carregado: a resposta é montada sem nova query
+        db_prescription.doctor = doctors[item.doctor_id]
+        affected_seniors[item.senior_id].append(db_prescription.id)
+        written.append(db_prescription)
+        results.append(
+            {
+                "index": index,
+                "prescription": build_prescription_read(db_prescription, medications),
+            }
+        )
+
+    if written:
+        replace_dose_schedules(db, written)
+        refresh_senior_forecasts(db, list(affected_seniors))
+        db.commit()
+        device_snapshots.invalidate_tag(*affected_seniors)
+        report_cache.invalidate_tag(*affected_seniors)
+        for senior_id, prescription_ids in affected_seniors.items():
+            event_hub.publish(
+                senior_id, "prescriptions.updated", prescription_ids=prescription_ids
+            )
+    return results
 
 
 @router.get(
     "/", response_model=List[PrescriptionRead], dependencies=[Depends(get_current_user)]
 )
 def list_prescriptions(
-    db: Session = Depends(get_session), current_user: User = Depends(get_current_user)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    senior_id: Optional[str] = None,
+    doctor_id: Optional[str] = None,
+    medication_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
 ):
-    prescriptions = db.query(Prescription).all()
-    result = []
-    for presc in prescriptions:
-        med = db.query(Medication).filter(Medication.id == presc.medication_id).first()
-        medication_data = None
-        if med:
-            medication_data = {
-                "id": med.id,
-                "name": med.name,
-                "description": med.description,
-            }
-        doctor = db.query(User).filter(User.id == presc.doctor_id).first()
-        doctor_data = None
-        if doctor:
-            doctor_data = {"id": doctor.id, "name": doctor.name}
-        presc_data = {
-            **presc.__dict__,
-            "medication": medication_data,
-            "doctor": doctor_data,
-        }
-        result.append(PrescriptionRead(**presc_data))
-    return result
+    query = prescription_read_query(db)
+    if senior_id:
+        query = query.filter(Prescription.senior_id == senior_id)
+    if doctor_id:
+        query = query.filter(Prescription.doctor_id == doctor_id)
+    if medication_id:
+        query = query.filter(Prescription.medication_id == medication_id)
+    if created_from:
+        query = query.filter(Prescription.created_at >= created_from)
+    if created_to:
+        query = query.filter(Prescription.created_at < created_to)
+    keys = [Prescription.created_at, Prescription.id]
+    rows = apply_keyset(query, keys, limit, after).all()
+    prescriptions, next_cursor = split_page(rows, keys, limit)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return json_list_response(
+        PrescriptionRead, build_prescription_reads(db, prescriptions), headers
+    )
+
+
+@router.get("/export", dependencies=[Depends(get_current_user)])
+def export_prescriptions(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    senior_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    columns = [
+        "id",
+        "senior_id",
+        "medication_id",
+        "medication_name",
+        "doctor_id",
+        "doctor_name",
+        "description",
+        "dosage",
+        "frequency",
+        "start_date",
+        "end_date",
+        "created_at",
+    ]
+    statement = (
+        select(
+            Prescription.id,
+            Prescription.senior_id,
+            Prescription.medication_id,
+            Medication.name,
+            Prescription.doctor_id,
+            User.name,
+            Prescription.description,
+            Prescription.dosage,
+            Prescription.frequency,
+            Prescription.start_date,
+            Prescription.end_date,
+            Prescription.created_at,
+        )
+        .outerjoin(Medication, Medication.id == Prescription.medication_id)
+        .outerjoin(User, User.id == Prescription.doctor_id)
+    )
+    if senior_id:
+        statement = statement.where(Prescription.senior_id == senior_id)
+    if created_from:
+        statement = statement.where(Prescription.created_at >= created_from)
+    if created_to:
+        statement = statement.where(Prescription.created_at < created_to)
+    statement = statement.order_by(Prescription.created_at, Prescription.id)
+    return stream_export(statement, columns, format, "prescriptions")
 
 
 @router.get(
@@ -138,12 +379,7 @@ def get_prescription(
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    prescription = (
-        db.query(Prescription).filter(Prescription.id == prescription_id).first()
-    )
-    if not prescription:
-        raise HTTPException(status_code=404, detail="Prescription not found")
-    return prescription
+    return get_prescription_read(db, prescription_id)
 
 
 @router.delete(
@@ -159,8 +395,16 @@ def delete_prescription(
     )
     if not prescription:
         raise HTTPException(status_code=404, detail="Prescription not found")
+    senior_id = prescription.senior_id
+    delete_dose_schedule(db, prescription.id)
     db.delete(prescription)
+    refresh_senior_forecasts(db, [senior_id])
     db.commit()
+    device_snapshots.invalidate_tag(senior_id)
+    report_cache.invalidate_tag(senior_id)
+    event_hub.publish(
+        senior_id, "prescription.deleted", prescription_id=prescription_id
+    )
     return
 
 
@@ -180,6 +424,7 @@ def update_prescription(
     )
     if not db_prescription:
         raise HTTPException(status_code=404, detail="Prescription not found")
+    previous_senior_id = db_prescription.senior_id
     db_prescription.senior_id = prescription.senior_id
     db_prescription.medication_id = prescription.medication_id
     db_prescription.doctor_id = prescription.doctor_id
@@ -196,81 +441,69 @@ def update_prescription(
         else datetime.fromisoformat(prescription.end_date)
     )
     db_prescription.description = prescription.description
+    replace_dose_schedule(db, db_prescription)
+    refresh_senior_forecasts(db, {previous_senior_id, prescription.senior_id})
     db.commit()
+    device_snapshots.invalidate_tag(previous_senior_id, prescription.senior_id)
+    report_cache.invalidate_tag(previous_senior_id, prescription.senior_id)
+    for senior_id in {previous_senior_id, prescription.senior_id}:
+        event_hub.publish(
+            senior_id, "prescription.updated", prescription_id=prescription_id
+        )
     db.refresh(db_prescription)
     # Monta resposta com medication e doctor
-    med = (
-        db.query(Medication)
-        .filter(Medication.id == db_prescription.medication_id)
-        .first()
-    )
-    medication_data = None
-    if med:
-        medication_data = {
-            "id": med.id,
-            "name": med.name,
-            "description": med.description,
-        }
-    doctor = db.query(User).filter(User.id == db_prescription.doctor_id).first()
-    doctor_data = None
-    if doctor:
-        doctor_data = {"id": doctor.id, "name": doctor.name}
-    presc_data = {
-        **db_prescription.__dict__,
-        "medication": medication_data,
-        "doctor": doctor_data,
-    }
-    return PrescriptionRead(**presc_data)
+    return get_prescription_read(db, db_prescription.id)
 
 
-@router.get("/by_device/{device_id}", dependencies=[Depends(get_current_user)])
-def get_valid_prescriptions_by_device(
-    device_id: str, db: Session = Depends(get_session)
-):
-    from datetime import date
+def prescription_read_select():
+    # Versão select() de prescription_read_query, para as rotas com AsyncSession
+    return select(Prescription).options(selectinload(Prescription.doctor))
 
-    from models.device import Device
-    from models.prescription import Prescription
-    from models.senior import Senior
 
-    device = db.query(Device).filter(Device.id == device_id).first()
-    if not device:
+async def _build_device_snapshot(
+    db: AsyncSession, device_id: str, today: date
+) -> tuple:
+    senior_id = (
+        await db.exec(select(Device.senior_id).where(Device.id == device_id))
+    ).first()
+    if not senior_id:
         raise HTTPException(status_code=404, detail="Device not found")
-    senior = device.senior
-    if not senior:
-        raise HTTPException(status_code=404, detail="Senior not found")
-    today = date.today()
+    generation = device_snapshots.generation([senior_id])
     prescriptions = (
-        db.query(Prescription)
-        .filter(Prescription.senior_id == senior.id, Prescription.end_date >= today)
-        .all()
+        await db.exec(
+            prescription_read_select().where(
+                Prescription.senior_id == senior_id, Prescription.end_date >= today
+            )
+        )
+    ).all()
+    body = dump_json_list(
+        PrescriptionRead, await db.run_sync(build_prescription_reads, prescriptions)
+    )
+    snapshot = (make_etag(body), body)
+    device_snapshots.set(
+        (device_id, today), snapshot, tags=[senior_id], generation=generation
     )
-    return prescriptions
+    return snapshot
+
+
+@router.get("/by_device/{device_id}", dependencies=[Depends(get_current_user_async)])
+async def get_valid_prescriptions_by_device(
+    device_id: str, request: Request, db: AsyncSession = Depends(get_async_session)
+):
+    # Snapshot por device e por dia; invalidado pelas escritas de prescrição do senior
+    today = date.today()
+    snapshot = device_snapshots.get((device_id, today))
+    if snapshot is None:
+        snapshot = await _build_device_snapshot(db, device_id, today)
+    etag, body = snapshot
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.get("/by_senior/{senior_id}", dependencies=[Depends(get_current_user)])
 def get_prescriptions_by_senior(senior_id: str, db: Session = Depends(get_session)):
     prescriptions = (
-        db.query(Prescription).filter(Prescription.senior_id == senior_id).all()
+        prescription_read_query(db).filter(Prescription.senior_id == senior_id).all()
     )
-    result = []
-    for presc in prescriptions:
-        med = db.query(Medication).filter(Medication.id == presc.medication_id).first()
-        medication_data = None
-        if med:
-            medication_data = {
-                "id": med.id,
-                "name": med.name,
-                "description": med.description,
-            }
-        doctor = db.query(User).filter(User.id == presc.doctor_id).first()
-        doctor_data = None
-        if doctor:
-            doctor_data = {"id": doctor.id, "name": doctor.name}
-        presc_data = {
-            **presc.__dict__,
-            "medication": medication_data,
-            "doctor": doctor_data,
-        }
-        result.append(PrescriptionRead(**presc_data))
-    return result
+    return build_prescription_reads(db, prescriptions)
@@ -1,15 +1,15 @@
-from datetime import date, datetime
-from typing import List
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
 from database import get_current_user, get_session
 from models.compartment import Compartment
 from models.device import Device
 from models.dispenser import Dispenser
-from models.medication import Medication
+from models.doseevent import DoseEvent, DoseEventStatus
 from models.prescription import Prescription
 from models.report import Report
 from models.senior import Senior
@@ -17,20 +17,39 @@ from models.symptom import Symptom
 from models.user import User
 from models.usersenior import UserSenior
 from schemas.report import ReportCreate, ReportRead
+from utils.adherence import build_adherence_report
+from utils.cache import TaggedCache
+from utils.etag import etag_matches, make_etag, not_modified
 from utils.jwt import decode_access_token
+from utils.medication_catalog import medication_catalog
 
 router = APIRouter()
 
 
-@router.get("/report/{senior_id}", dependencies=[Depends(get_current_user)])
-def get_consolidated_report(senior_id: str, db: Session = Depends(get_session)):
+HISTORY_DAYS = 7
+TAKEN_STATUSES = (DoseEventStatus.taken.value, DoseEventStatus.late.value)
+
+# Relatórios montados por (senior_id, since, limit, dia), com a tag do senior
+report_cache = TaggedCache(maxsize=1024, ttl=300)
+
+
+def pain_level_to_pt(level):
+    if level <= 2:
+        return "Leve"
+    elif level <= 5:
+        return "Moderado"
+    else:
+        return "Forte"
+
+
+def build_consolidated_report(
+    db: Session, senior_id: str, since: Optional[datetime], limit: int
+) -> dict:
     # Busca o idoso pelo CPF
     senior = db.query(Senior).filter(Senior.id == senior_id).first()
     if not senior:
         raise HTTPException(status_code=404, detail="Senior not found")
 
-    # Nome, idade, identificador
-    name = senior.name
     # Calcula idade
     try:
         birth_date = datetime.strptime(senior.birth_date, "%d/%m/%Y")
@@ -42,13 +61,13 @@ def get_consolidated_report(senior_id: str, db: Session = Depends(get_session)):
         )
     except Exception:
         age = None
-    identifier = senior.id
 
     # Médicos vinculados
-    user_seniors = db.query(UserSenior).filter(UserSenior.senior_id == senior_id).all()
-    doctor_ids = [us.user_id for us in user_seniors]
     doctors = (
-        db.query(User).filter(User.id.in_(doctor_ids), User.role == "doctor").all()
+        db.query(User.name)
+        .join(UserSenior, UserSenior.user_id == User.id)
+        .filter(UserSenior.senior_id == senior_id, User.role == "doctor")
+        .all()
     )
     doctors_list = [
         {
@@ -58,37 +77,28 @@ def get_consolidated_report(senior_id: str, db: Session = Depends(get_session)):
         for d in doctors
     ]
 
-    # Prescrições
+    # Prescrições (nome do medicamento pelo catálogo em memória)
     prescriptions = (
-        db.query(Prescription).filter(Prescription.senior_id == senior_id).all()
-    )
-    prescriptions_list = []
-    for p in prescriptions:
-        med = db.query(Medication).filter(Medication.id == p.medication_id).first()
-        prescriptions_list.append(
-            {
-                "name": med.name if med else "",
-                "dosage": p.dosage,
-                "frequency": p.frequency,
-            }
+        db.query(
+            Prescription.dosage, Prescription.frequency, Prescription.medication_id
         )
-
-    # Sintomas
-    symptoms = (
-        db.query(Symptom)
-        .filter(Symptom.senior_id == senior_id)
-        .order_by(Symptom.created_at.desc())
+        .filter(Prescription.senior_id == senior_id)
         .all()
     )
+    prescriptions_list = [
+        {
+            "name": medication_catalog.name(p.medication_id) or "",
+            "dosage": p.dosage,
+            "frequency": p.frequency,
+        }
+        for p in prescriptions
+    ]
 
-    def pain_level_to_pt(level):
-        if level <= 2:
-            return "Leve"
-        elif level <= 5:
-            return "Moderado"
-        else:
-            return "Forte"
-
+    # Sintomas mais recentes, limitados por since/limit (índice senior_id, created_at)
+    symptoms_query = db.query(Symptom).filter(Symptom.senior_id == senior_id)
+    if since:
+        symptoms_query = symptoms_query.filter(Symptom.created_at >= since)
+    symptoms = symptoms_query.order_by(Symptom.created_at.desc()).limit(limit).all()
     symptoms_list = [
         {
             "name": s.name,
@@ -99,44 +109,80 @@ def get_consolidated_report(senior_id: str, db: Session = Depends(get_session)):
         for s in symptoms
     ]
 
-    # Histórico de medicação (simulado: doses previstas e tomadas)
-    # Aqui, normalmente, buscaria uma tabela de doses tomadas. Como não há, simula com horários das prescrições.
-    medication_history = []
-    for p in prescriptions:
-        med = db.query(Medication).filter(Medication.id == p.medication_id).first()
-        # Para cada horário previsto, simula se foi tomada (alternando True/False)
-        times = []
-        if p.frequency:
-            if ":" in p.frequency:
-                times = [t.strip() for t in p.frequency.split(",")]
-            else:
-                times = [
-                    f"{int(h):02d}:00"
-                    for h in p.frequency.replace(",", " ").split()
-                    if h.isdigit()
-                ]
-        for idx, t in enumerate(times):
-            # Simula datas recentes
-            dt = datetime.now().replace(
-                hour=int(t[:2]), minute=int(t[3:]), second=0, microsecond=0
-            )
-            medication_history.append(
-                {
-                    "name": med.name if med else "",
-                    "date": dt.strftime("%d/%m/%Y"),
-                    "time": dt.strftime("%H:%M"),
-                    "taken": idx % 2 == 0,  # alterna True/False
-                }
-            )
-
-    return JSONResponse(
+    # Histórico de medicação: range query em (senior_id, scheduled_at)
+    history_from = since or datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+    events = (
+        db.query(DoseEvent, Prescription.medication_id)
+        .outerjoin(Prescription, Prescription.id == DoseEvent.prescription_id)
+        .filter(
+            DoseEvent.senior_id == senior_id,
+            DoseEvent.scheduled_at >= history_from,
+            DoseEvent.status != DoseEventStatus.dispensed.value,
+        )
+        .order_by(DoseEvent.scheduled_at.desc())
+        .limit(limit)
+        .all()
+    )
+    medication_history = [
         {
-            "name": name,
-            "age": age,
-            "identifier": identifier,
-            "doctors": doctors_list,
-            "prescriptions": prescriptions_list,
-            "symptoms": symptoms_list,
-            "medicationHistory": medication_history,
+            "name": medication_catalog.name(medication_id) or "",
+            "date": event.scheduled_at.strftime("%d/%m/%Y"),
+            "time": event.scheduled_at.strftime("%H:%M"),
+            "taken": event.status in TAKEN_STATUSES,
+            "status": event.status,
         }
-    )
+        for event, medication_id in events
+    ]
+
+    return {
+        "name": senior.name,
+        "age": age,
+        "identifier": senior.id,
+        "doctors": doctors_list,
+        "prescriptions": prescriptions_list,
+        "symptoms": symptoms_list,
+        "medicationHistory": medication_history,
+    }
+
+
+@router.get("/adherence")
+def get_adherence(
+    senior_ids: Optional[List[str]] = Query(None),
+    days: int = Query(30, ge=1, le=365),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_session),
+):
+    # Aceita ?senior_ids=a&senior_ids=b ou ?senior_ids=a,b; padrão: seniors do usuário
+    ids = [s for value in senior_ids or [] for s in value.split(",") if s]
+    if not ids:
+        ids = [
+            senior_id
+            for (senior_id,) in db.query(UserSenior.senior_id).filter(
+                UserSenior.user_id == current_user.id
+            )
+        ]
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return []
+    return build_adherence_report(db, ids, days)
+
+
+@router.get("/report/{senior_id}", dependencies=[Depends(get_current_user)])
+def get_consolidated_report(
+    senior_id: str,
+    request: Request,
+    since: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_session),
+):
+    key = (senior_id, since, limit, date.today())
+    cached = report_cache.get(key)
+    if cached is None:
+        generation = report_cache.generation([senior_id])
+        body = orjson.dumps(build_consolidated_report(db, senior_id, since, limit))
+        cached = (make_etag(body), body)
+        report_cache.set(key, cached, tags=[senior_id], generation=generation)
+    etag, body = cached
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
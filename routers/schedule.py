@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_current_user, get_session
+from models.device import Device
+from models.doseschedule import DoseSchedule
+from schemas.schedule import DoseInstantRead
+from utils.dose_schedule import next_dose_instants
+from utils.medication_catalog import medication_catalog
+
+router = APIRouter()
+
+
+def get_next_doses(db: Session, senior_id: str, n: int) -> list:
+    now = datetime.utcnow()
+    # Range query no índice (senior_id, end_date): só agendas ainda vigentes
+    entries = (
+        db.query(DoseSchedule)
+        .filter(DoseSchedule.senior_id == senior_id, DoseSchedule.end_date >= now)
+        .all()
+    )
+    return [
+        {
+            "prescription_id": entry.prescription_id,
+            "medication_id": entry.medication_id,
+            "medication_name": medication_catalog.name(entry.medication_id),
+            "scheduled_at": instant,
+        }
+        for instant, entry in next_dose_instants(entries, now, n)
+    ]
+
+
+@router.get(
+    "/by_senior/{senior_id}/next",
+    response_model=List[DoseInstantRead],
+    dependencies=[Depends(get_current_user)],
+)
+def get_next_doses_by_senior(
+    senior_id: str,
+    n: int = Query(10, ge=1, le=200),
+    db: Session = Depends(get_session),
+):
+    return get_next_doses(db, senior_id, n)
+
+
+@router.get(
+    "/by_device/{device_id}/next",
+    response_model=List[DoseInstantRead],
+    dependencies=[Depends(get_current_user)],
+)
+def get_next_doses_by_device(
+    device_id: str,
+    n: int = Query(10, ge=1, le=200),
+    db: Session = Depends(get_session),
+):
+    senior_id = db.query(Device.senior_id).filter(Device.id == device_id).scalar()
+    if not senior_id:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return get_next_doses(db, senior_id, n)
@@ -1,20 +1,218 @@
+import uuid
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 
 from database import get_current_user, get_session
 from models.compartment import Compartment
 from models.device import Device
 from models.dispenser import Dispenser
+from models.prescription import Prescription
 from models.senior import Senior
+from models.symptom import Symptom
 from models.user import User
 from models.usersenior import UserSenior
+from routers.device import get_dispenser_overview
+from routers.prescriptions import build_prescription_reads
+from routers.reports import report_cache
 from schemas.senior import SeniorCreate, SeniorRead
+from schemas.symptom import SymptomRead
 
 router = APIRouter()
 
+DASHBOARD_INCLUDES = {"device", "dispenser", "prescriptions", "symptoms"}
+COMPARTMENTS_PER_DISPENSER = 14
+
+
+def get_senior_data(senior: Senior, device_id: Optional[str]) -> dict:
+    return {
+        "id": senior.id,
+        "name": senior.name,
+        "birth_date": senior.birth_date,
+        "created_at": senior.created_at,
+        "device_id": device_id,
+    }
+
+
+def get_devices_by_senior(db: Session, senior_ids: list) -> dict:
+    # Um SELECT ... IN para todos os seniors, em vez de um por senior
+    devices = {}
+    for device in db.query(Device).filter(Device.senior_id.in_(senior_ids)):
+        devices.setdefault(device.senior_id, device)
+    return devices
+
+
+def get_seniors_data(db: Session, seniors: list) -> list:
+    devices = get_devices_by_senior(db, [s.id for s in seniors])
+    return [
+        get_senior_data(s, devices[s.id].id if s.id in devices else None)
+        for s in seniors
+    ]
+
+
+def get_latest_symptoms(db: Session, senior_ids: list, per_senior: int) -> dict:
+    # Top-N por senior numa query só, com ROW_NUMBER() sobre (senior_id, created_at)
+    ranked = (
+        db.query(
+            Symptom.id,
+            func.row_number()
+            .over(partition_by=Symptom.senior_id, order_by=Symptom.created_at.desc())
+            .label("position"),
+        )
+        .filter(Symptom.senior_id.in_(senior_ids))
+        .subquery()
+    )
+    symptoms = {senior_id: [] for senior_id in senior_ids}
+    for symptom in (
+        db.query(Symptom)
+        .join(ranked, ranked.c.id == Symptom.id)
+        .filter(ranked.c.position <= per_senior)
+        .order_by(Symptom.senior_id, Symptom.created_at.desc())
+    ):
+        symptoms[symptom.senior_id].append(SymptomRead(**symptom.dict()))
+    return symptoms
+
+
+def build_dashboard(
+    db: Session, seniors: list, include: set, symptoms_limit: int
+) -> list:
+    # Número fixo de queries, qualquer que seja a quantidade de seniors
+    senior_ids = [s.id for s in seniors]
+    devices = get_devices_by_senior(db, senior_ids)
+    dispensers = {}
+    if "dispenser" in include and devices:
+        dispensers = {
+            d.device_id: d
+            for d in db.query(Dispenser)
+            .options(selectinload(Dispenser.compartments))
+            .filter(Dispenser.device_id.in_([d.id for d in devices.values()]))
+        }
+    prescriptions = {senior_id: [] for senior_id in senior_ids}
+    if "prescriptions" in include:
+        active = (
+            db.query(Prescription)
+            .options(selectinload(Prescription.doctor))
+            .filter(
+                Prescription.senior_id.in_(senior_ids),
+                Prescription.end_date >= datetime.utcnow(),
+            )
+            .order_by(Prescription.start_date)
+            .all()
+        )
+        for presc in build_prescription_reads(db, active):
+            prescriptions[presc.senior_id].append(presc)
+    symptoms = {}
+    if "symptoms" in include:
+        symptoms = get_latest_symptoms(db, senior_ids, symptoms_limit)
+
+    result = []
+    for senior in seniors:
+        device = devices.get(senior.id)
+        data = get_senior_data(senior, device.id if device else None)
+        if "device" in include:
+            data["device"] = (
+                {
+                    "id": device.id,
+                    "status": device.status,
+                    "last_sync": device.last_sync,
+                }
+                if device
+                else None
+            )
+        if "dispenser" in include:
+            dispenser = dispensers.get(device.id) if device else None
+            data["dispenser"] = get_dispenser_overview(dispenser) if dispenser else None
+        if "prescriptions" in include:
+            data["prescriptions"] = prescriptions[senior.id]
+        if "symptoms" in include:
+            data["symptoms"] = symptoms[senior.id]
+        result.append(data)
+    return result
+
+
+def raise_provisioning_conflict(db: Session, seniors: list):
+    # Só no caminho de erro: descobre qual chave já existia para a mensagem
+    existing = (
+        db.query(Senior.id).filter(Senior.id.in_([s.id for s in seniors])).all()
+    )
+    if existing:
+        raise HTTPException(
+            status_code=400,
+            detail="Já existe um idoso cadastrado com este CPF: "
+            + ", ".join(row.id for row in existing),
+        )
+    existing = (
+        db.query(Device.id).filter(Device.id.in_([s.device_id for s in seniors])).all()
+    )
+    if existing:
+        raise HTTPException(
+            status_code=400,
+            detail="Device ID already assigned to another Senior: "
+            + ", ".join(row.id for row in existing),
+        )
+    raise HTTPException(status_code=409, detail="Conflicting provisioning data.")
+
+
+def provision_seniors(db: Session, seniors: list, user_id: str) -> list:
+    # Senior, relação com o user, Device, Dispenser e compartimentos vazios numa
+    # única transação, um executemany por tabela. As chaves primárias de Senior
+    # e Device garantem a unicidade, sem SELECTs prévios.
+    created_at = datetime.utcnow().isoformat()
+    senior_rows = [
+        {
+            "id": s.id,
+            "name": s.name,
+            "birth_date": s.birth_date,
+            "created_at": created_at,
+        }
+        for s in seniors
+    ]
+    dispenser_ids = [str(uuid.uuid4()) for _ in seniors]
+    inserts = [
+        (insert(Senior), senior_rows),
+        (
+            insert(UserSenior),
+            [{"user_id": user_id, "senior_id": s.id} for s in seniors],
+        ),
+        (
+            insert(Device),
+            [
+                {"id": s.device_id, "senior_id": s.id, "status": "active"}
+                for s in seniors
+            ],
+        ),
+        (
+            insert(Dispenser),
+            [
+                {"id": dispenser_id, "device_id": s.device_id}
+                for s, dispenser_id in zip(seniors, dispenser_ids)
+            ],
+        ),
+        (
+            insert(Compartment),
+            [
+                {"dispenser_id": dispenser_id, "medication_id": "", "quantity": 0}
+                for dispenser_id in dispenser_ids
+                for _ in range(COMPARTMENTS_PER_DISPENSER)
+            ],
+        ),
+    ]
+    try:
+        for statement, rows in inserts:
+            db.exec(statement, params=rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise_provisioning_conflict(db, seniors)
+    # Compartimentos vazios não têm previsão: nada a recalcular
+    for s in seniors:
+        report_cache.invalidate_tag(s.id)
+    return [{**row, "device_id": s.device_id} for row, s in zip(senior_rows, seniors)]
+
 
 @router.get("/by_device/{device_id}", dependencies=[Depends(get_current_user)])
 def get_senior_by_device(device_id: str, db: Session = Depends(get_session)):
@@ -38,85 +236,63 @@ def create_senior(
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
-    # Verifica se já existe um Senior com o mesmo CPF
-    existing_senior = db.query(Senior).filter(Senior.id == senior.id).first()
-    if existing_senior:
-        raise HTTPException(
-            status_code=400, detail="Já existe um idoso cadastrado com este CPF."
-        )
+    return provision_seniors(db, [senior], current_user.id)[0]
 
-    # Verifica se o device_id já está associado a outro Senior
-    existing_device = db.query(Device).filter(Device.id == senior.device_id).first()
-    if existing_device:
-        raise HTTPException(
-            status_code=400, detail="Device ID already assigned to another Senior."
-        )
 
-    # Cria o Senior com CPF como id
-    db_senior = Senior(
-        id=senior.id,
-        name=senior.name,
-        birth_date=senior.birth_date,
-        created_at=datetime.utcnow().isoformat(),
-    )
-    db.add(db_senior)
-    db.commit()
-    db.refresh(db_senior)
-
-    # Relaciona User com Senior
-    user_senior = UserSenior(user_id=current_user.id, senior_id=db_senior.id)
-    db.add(user_senior)
-    db.commit()
-
-    # Cria o Device
-    device = Device(id=senior.device_id, senior_id=db_senior.id, status="active")
-    db.add(device)
-    db.commit()
-    db.refresh(device)
-
-    # Cria o Dispenser
-    dispenser = Dispenser(device_id=device.id)
-    db.add(dispenser)
-    db.commit()
-    db.refresh(dispenser)
-
-    # Cria os Compartments
-    for i in range(14):
-        compartment = Compartment(
-            dispenser_id=dispenser.id, medication_id="", quantity=0
-        )
-        db.add(compartment)
-    db.commit()
-
-    # Retorna o Senior com o device_id preenchido
-    return {
-        "id": db_senior.id,
-        "name": db_senior.name,
-        "birth_date": db_senior.birth_date,
-        "created_at": db_senior.created_at,
-        "device_id": device.id,
-    }
+@router.post(
+    "/batch",
+    response_model=List[SeniorRead],
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(get_current_user)],
+)
+def create_seniors_batch(
+    seniors: List[SeniorCreate],
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    # Cadastro de uma instituição inteira: tudo ou nada
+    for field, label in (("id", "CPF"), ("device_id", "device_id")):
+        values = [getattr(s, field) for s in seniors]
+        if len(set(values)) != len(values):
+            raise HTTPException(status_code=400, detail=f"Duplicate {label} in batch.")
+    if not seniors:
+        return []
+    return provision_seniors(db, seniors, current_user.id)
 
 
 @router.get(
     "/", response_model=List[SeniorRead], dependencies=[Depends(get_current_user)]
 )
 def list_seniors(db: Session = Depends(get_session)):
-    seniors = db.query(Senior).all()
-    # Para cada senior, buscar o device_id correspondente
-    result = []
-    for senior in seniors:
-        device = db.query(Device).filter(Device.senior_id == senior.id).first()
-        result.append(
-            {
-                "id": senior.id,
-                "name": senior.name,
-                "birth_date": senior.birth_date,
-                "created_at": senior.created_at,
-                "device_id": device.id if device else None,
-            }
+    return get_seniors_data(db, db.query(Senior).all())
+
+
+@router.get("/dashboard")
+def get_dashboard(
+    include: str = "device,dispenser,prescriptions,symptoms",
+    user_id: Optional[str] = None,
+    symptoms_limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    # Tudo o que o painel do cuidador desenha, para todos os seus seniors
+    expansions = {name.strip() for name in include.split(",") if name.strip()}
+    unknown = expansions - DASHBOARD_INCLUDES
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown include: {', '.join(sorted(unknown))}",
         )
-    return result
+    seniors = (
+        db.query(Senior)
+        .join(UserSenior, UserSenior.senior_id == Senior.id)
+        .filter(UserSenior.user_id == (user_id or current_user.id))
+        .order_by(Senior.name)
+        .all()
+    )
+    if not seniors:
+        return []
+    return build_dashboard(db, seniors, expansions, symptoms_limit)
 
 
 @router.get(
@@ -148,6 +324,7 @@ def update_senior(
     for key, value in senior.dict().items():
         setattr(db_senior, key, value)
     db.commit()
+    report_cache.invalidate_tag(senior_id)
     db.refresh(db_senior)
     device = db.query(Device).filter(Device.senior_id == db_senior.id).first()
     return {
@@ -168,6 +345,7 @@ def delete_senior(senior_id: str, db: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Senior not found")
     db.delete(senior)
     db.commit()
+    report_cache.invalidate_tag(senior_id)
     return
 
 
@@ -177,25 +355,13 @@ def delete_senior(senior_id: str, db: Session = Depends(get_session)):
     dependencies=[Depends(get_current_user)],
 )
 def get_seniors_by_user(user_id: str, db: Session = Depends(get_session)):
-    user_senior_relations = (
-        db.query(UserSenior).filter(UserSenior.user_id == user_id).all()
+    seniors = (
+        db.query(Senior)
+        .join(UserSenior, UserSenior.senior_id == Senior.id)
+        .filter(UserSenior.user_id == user_id)
+        .all()
     )
-    senior_ids = [rel.senior_id for rel in user_senior_relations]
-    seniors = db.query(Senior).filter(Senior.id.in_(senior_ids)).all()
-    # Adiciona o device_id em cada retorno
-    result = []
-    for senior in seniors:
-        device = db.query(Device).filter(Device.senior_id == senior.id).first()
-        result.append(
-            {
-                "id": senior.id,
-                "name": senior.name,
-                "birth_date": senior.birth_date,
-                "created_at": senior.created_at,
-                "device_id": device.id if device else None,
-            }
-        )
-    return result
+    return get_seniors_data(db, seniors)
 
 
 @router.post(
@@ -223,4 +389,5 @@ def relate_user_senior(
     relation = UserSenior(user_id=user_id, senior_id=senior_id)
     db.add(relation)
     db.commit()
+    report_cache.invalidate_tag(senior_id)
     return {"message": "User now related to Senior."}
@@ -1,19 +1,47 @@
-from typing import List
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-
-from database import get_current_user, get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import (
+    get_async_session,
+    get_current_user,
+    get_current_user_async,
+    get_session,
+)
 from models.symptom import Symptom
 from models.user import User
-from routers.prescriptions import get_current_user
+from routers.reports import report_cache
 from schemas.symptom import SymptomCreate, SymptomRead
+from utils.events import event_hub
+from utils.export import stream_export
 from utils.jwt import decode_access_token
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    apply_keyset,
+    split_page,
+)
+from utils.serialization import json_list_response
 
 router = APIRouter()
 
 
+def publish_symptom_event(event_type: str, symptom: Symptom):
+    event_hub.publish(
+        symptom.senior_id,
+        event_type,
+        symptom_id=symptom.id,
+        name=symptom.name,
+        pain_level=symptom.pain_level,
+    )
+
+
 @router.post("/", response_model=SymptomRead, dependencies=[Depends(get_current_user)])
 def create_symptom(
     symptom: SymptomCreate,
@@ -38,7 +66,9 @@ def create_symptom(
     )
     db.add(db_symptom)
     db.commit()
+    report_cache.invalidate_tag(symptom.senior_id)
     db.refresh(db_symptom)
+    publish_symptom_event("symptom.created", db_symptom)
     return db_symptom
 
 
@@ -46,9 +76,48 @@ def create_symptom(
     "/", response_model=List[SymptomRead], dependencies=[Depends(get_current_user)]
 )
 def list_symptoms(
-    db: Session = Depends(get_session), current_user: User = Depends(get_current_user)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    senior_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    min_pain_level: Optional[int] = None,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
 ):
-    return db.query(Symptom).all()
+    query = db.query(Symptom)
+    if senior_id:
+        query = query.filter(Symptom.senior_id == senior_id)
+    if created_from:
+        query = query.filter(Symptom.created_at >= created_from)
+    if created_to:
+        query = query.filter(Symptom.created_at < created_to)
+    if min_pain_level is not None:
+        query = query.filter(Symptom.pain_level >= min_pain_level)
+    keys = [Symptom.created_at, Symptom.id]
+    rows = apply_keyset(query, keys, limit, after).all()
+    symptoms, next_cursor = split_page(rows, keys, limit)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return json_list_response(SymptomRead, symptoms, headers)
+
+
+@router.get("/export", dependencies=[Depends(get_current_user)])
+def export_symptoms(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    senior_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    columns = ["id", "senior_id", "name", "description", "pain_level", "created_at"]
+    statement = select(*(getattr(Symptom, col) for col in columns))
+    if senior_id:
+        statement = statement.where(Symptom.senior_id == senior_id)
+    if created_from:
+        statement = statement.where(Symptom.created_at >= created_from)
+    if created_to:
+        statement = statement.where(Symptom.created_at < created_to)
+    statement = statement.order_by(Symptom.created_at, Symptom.id)
+    return stream_export(statement, columns, format, "symptoms")
 
 
 @router.get(
@@ -86,8 +155,11 @@ def delete_symptom(
     )
     if not symptom:
         raise HTTPException(status_code=404, detail="Symptom not found")
+    senior_id = symptom.senior_id
     db.delete(symptom)
     db.commit()
+    report_cache.invalidate_tag(senior_id)
+    event_hub.publish(senior_id, "symptom.deleted", symptom_id=symptom_id)
     return
 
 
@@ -112,7 +184,9 @@ def update_symptom(
     db_symptom.name = symptom.name
     db_symptom.description = symptom.description
     db.commit()
+    report_cache.invalidate_tag(db_symptom.senior_id)
     db.refresh(db_symptom)
+    publish_symptom_event("symptom.updated", db_symptom)
     return db_symptom
 
 
@@ -124,22 +198,24 @@ def get_symptoms_by_senior(senior_id: str, db: Session = Depends(get_session)):
     return symptoms
 
 
-@router.post("/by_device/{device_id}", dependencies=[Depends(get_current_user)])
-def create_symptom_by_device(
-    device_id: str, symptom: SymptomCreate, db: Session = Depends(get_session)
+@router.post(
+    "/by_device/{device_id}", dependencies=[Depends(get_current_user_async)]
+)
+async def create_symptom_by_device(
+    device_id: str,
+    symptom: SymptomCreate,
+    db: AsyncSession = Depends(get_async_session),
 ):
     from models.device import Device
-    from models.senior import Senior
-    from models.symptom import Symptom
 
-    device = db.query(Device).filter(Device.id == device_id).first()
-    if not device:
+    senior_id = (
+        await db.exec(select(Device.senior_id).where(Device.id == device_id))
+    ).first()
+    if not senior_id:
         raise HTTPException(status_code=404, detail="Device not found")
-    senior = device.senior
-    if not senior:
-        raise HTTPException(status_code=404, detail="Senior not found")
-    db_symptom = Symptom(senior_id=senior.id, **symptom.dict(exclude={"senior_id"}))
+    db_symptom = Symptom(senior_id=senior_id, **symptom.dict(exclude={"senior_id"}))
     db.add(db_symptom)
-    db.commit()
-    db.refresh(db_symptom)
+    await db.commit()
+    report_cache.invalidate_tag(senior_id)
+    publish_symptom_event("symptom.created", db_symptom)
     return db_symptom
@@ -1,15 +1,33 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
-from database import get_current_user, get_session
+from database import get_current_user, get_session, user_cache
 from models.user import User
+from routers.prescriptions import device_snapshots
+from routers.reports import report_cache
 from schemas.user import UserCreate, UserRead
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    apply_keyset,
+    split_page,
+)
 
 router = APIRouter()
 
 
+def invalidate_user_caches(user_id: str):
+    # Token em cache não pode sobreviver a exclusão ou troca de role; relatórios
+    # e snapshots de device trazem o nome dos médicos
+    user_cache.invalidate_tag(user_id)
+    report_cache.clear()
+    device_snapshots.clear()
+
+
 @router.post("/", response_model=UserRead, dependencies=[Depends(get_current_user)])
 def create_user(user: UserCreate, db: Session = Depends(get_session)):
     db_user = User(**user.dict())
@@ -22,8 +40,28 @@ def create_user(user: UserCreate, db: Session = Depends(get_session)):
 @router.get(
     "/", response_model=List[UserRead], dependencies=[Depends(get_current_user)]
 )
-def list_users(db: Session = Depends(get_session)):
-    return db.query(User).all()
+def list_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    role: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_session),
+):
+    query = db.query(User)
+    if role:
+        query = query.filter(User.role == role)
+    if created_from:
+        query = query.filter(User.created_at >= created_from)
+    if created_to:
+        query = query.filter(User.created_at < created_to)
+    keys = [User.created_at, User.id]
+    rows = apply_keyset(query, keys, limit, after).all()
+    users, next_cursor = split_page(rows, keys, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
 
 
 @router.get(
@@ -46,6 +84,7 @@ def update_user(user_id: str, user: UserCreate, db: Session = Depends(get_sessio
     for key, value in user.dict().items():
         setattr(db_user, key, value)
     db.commit()
+    invalidate_user_caches(user_id)
     db.refresh(db_user)
     return db_user
 
@@ -57,4 +96,5 @@ def delete_user(user_id: str, db: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="User not found")
     db.delete(user)
     db.commit()
+    invalidate_user_caches(user_id)
     return
@@ -1,6 +1,7 @@
+from datetime import date, datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CompartmentBase(BaseModel):
@@ -12,11 +13,43 @@ class CompartmentCreate(CompartmentBase):
     pass
 
 
+class CompartmentReplace(CompartmentCreate):
+    version: Optional[int] = None  # Se informado, 409 quando a versão mudou
+
+
 class CompartmentRead(CompartmentBase):
     compartment_id: str
     dispenser_id: str
+    version: int
 
 
 class CompartmentUpdate(BaseModel):
     quantity: int
     medication_id: str
+    version: Optional[int] = None  # Se informado, 409 quando a versão mudou
+
+
+class CompartmentDispense(BaseModel):
+    quantity: int = Field(1, ge=1)
+    prescription_id: Optional[str] = None
+    scheduled_at: Optional[datetime] = None  # Padrão: agora
+
+
+class CompartmentDispenseResult(BaseModel):
+    compartment_id: str
+    quantity: int
+    version: int
+    dose_event_id: int
+
+
+class CompartmentForecastRead(BaseModel):
+    compartment_id: str
+    dispenser_id: str
+    senior_id: str
+    medication_id: str
+    medication_name: Optional[str] = None
+    quantity: int
+    doses_per_day: float
+    days_until_empty: Optional[float] = None
+    empty_at: Optional[datetime] = None
+    refill_date: Optional[date] = None
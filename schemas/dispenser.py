@@ -1,6 +1,6 @@
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from .compartment import CompartmentRead
 
@@ -13,6 +13,12 @@ class DispenserCreate(DispenserBase):
     pass
 
 
+class CompartmentSlot(BaseModel):
+    compartment_id: str
+    medication_id: str  # "" deixa o compartimento vazio
+    quantity: int = Field(ge=0)
+
+
 class DispenserRead(DispenserBase):
     id: str
     compartments: List[CompartmentRead] = []
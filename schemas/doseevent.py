@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from models.doseevent import DoseEventStatus
+
+
+class DoseEventCreate(BaseModel):
+    compartment_id: Optional[str] = None
+    prescription_id: Optional[str] = None
+    scheduled_at: datetime
+    taken_at: Optional[datetime] = None
+    status: DoseEventStatus
+
+
+class DoseEventRead(DoseEventCreate):
+    id: int
+    senior_id: str
+    device_id: str
+    created_at: datetime
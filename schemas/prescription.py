@@ -33,10 +33,15 @@ class PrescriptionCreate(PrescriptionBase):
     pass
 
 
+class PrescriptionBulkItem(PrescriptionCreate):
+    id: Optional[str] = None  # Se informado, atualiza a prescrição existente
+
+
 class PrescriptionRead(PrescriptionBase):
     id: str
     medication: MedicationRead
     doctor: Optional[dict] = None
+    created_at: Optional[datetime] = None
 
     @validator("start_date", pre=True, always=True)
     def serialize_start_date(cls, v):
@@ -49,3 +54,9 @@ class PrescriptionRead(PrescriptionBase):
         if isinstance(v, datetime):
             return v.isoformat()
         return v
+
+
+class PrescriptionBulkResult(BaseModel):
+    index: int
+    prescription: Optional[PrescriptionRead] = None
+    error: Optional[str] = None
@@ -0,0 +1,11 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class DoseInstantRead(BaseModel):
+    prescription_id: str
+    medication_id: str
+    medication_name: Optional[str] = None
+    scheduled_at: datetime
@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from .doseevent import DoseEventCreate
+from .prescription import PrescriptionRead
+from .symptom import SymptomBase
+
+
+class SyncSymptom(SymptomBase):
+    created_at: Optional[datetime] = None  # Momento registrado no device
+
+
+class SyncDispenseEvent(BaseModel):
+    compartment_id: str
+    quantity: int = Field(1, ge=1)
+    prescription_id: Optional[str] = None
+    scheduled_at: Optional[datetime] = None
+    dispensed_at: Optional[datetime] = None  # Momento registrado no device
+
+
+class SyncDispenseResult(BaseModel):
+    index: int  # Posição em dispense_events
+    compartment_id: str
+    quantity: Optional[int] = None  # Estoque depois da saída
+    version: Optional[int] = None
+    error: Optional[str] = None
+
+
+class DeviceSyncRequest(BaseModel):
+    cursor: Optional[str] = None  # Devolvido pelo sync anterior
+    symptoms: List[SyncSymptom] = []
+    dispense_events: List[SyncDispenseEvent] = []
+    dose_events: List[DoseEventCreate] = []
+
+
+class SyncCompartment(BaseModel):
+    compartment_id: str
+    dispenser_id: str
+    medication_id: str
+    medication_name: Optional[str] = None
+    quantity: int
+
+
+class DeviceSyncResponse(BaseModel):
+    cursor: Optional[str] = None  # None: nada sincronizado ainda
+    prescriptions: List[PrescriptionRead]
+    active_prescription_ids: List[str]
+    compartments: List[SyncCompartment]
+    dispense_results: List[SyncDispenseResult] = []
@@ -0,0 +1,215 @@
+# Dados iniciais e backfills, fora do boot da API: cada worker que sobe não
+# paga pelas consultas de existência nem pelos hashes bcrypt.
+#
+# Uso (na raiz do projeto, uma vez por banco; pode repetir sem duplicar):
+#   python -m seed
+#   python -m seed --no-example-data  # só agenda de doses e previsões
+import argparse
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from database import create_db_and_tables, engine
+from models.compartment import Compartment
+from models.compartmentforecast import CompartmentForecast
+from models.device import Device
+from models.dispenser import Dispenser
+from models.doseschedule import DoseSchedule
+from models.medication import Medication
+from models.prescription import Prescription
+from models.report import Report
+from models.senior import Senior
+from models.symptom import Symptom
+from models.user import User
+from models.usersenior import UserSenior
+from utils.dose_schedule import build_dose_schedule
+from utils.forecast import refresh_forecasts
+from utils.hashing import pwd_context
+
+MEDICATIONS = [
+    ("Paracetamol", "Analgésico e antitérmico"),
+    ("Dipirona", "Analgésico e antitérmico"),
+    ("Ibuprofeno", "Anti-inflamatório"),
+    ("Amoxicilina", "Antibiótico"),
+    ("Losartana", "Anti-hipertensivo"),
+    ("Metformina", "Antidiabético oral"),
+    ("Omeprazol", "Inibidor de bomba de próton"),
+    ("Sinvastatina", "Redutor de colesterol"),
+    ("AAS", "Antiplaquetário"),
+    ("Ranitidina", "Antiácido"),
+]
+
+
+def get_or_create_user(
+    session: Session, name: str, email: str, password: str, role: str
+) -> User:
+    user = session.query(User).filter(User.email == email).first()
+    if not user:
+        user = User(
+            name=name, email=email, password=pwd_context.hash(password), role=role
+        )
+        session.add(user)
+    return user
+
+
+def relate(session: Session, user: User, senior: Senior):
+    if (
+        not session.query(UserSenior)
+        .filter(UserSenior.user_id == user.id, UserSenior.senior_id == senior.id)
+        .first()
+    ):
+        session.add(UserSenior(user_id=user.id, senior_id=senior.id))
+
+
+def seed_example_data(session: Session):
+    # Popula a tabela de medicações se estiver vazia
+    if not session.query(Medication).first():
+        session.add_all(
+            [Medication(name=name, description=desc) for name, desc in MEDICATIONS]
+        )
+    # Usuário admin (cuidador) e médico padrão
+    caregiver = get_or_create_user(
+        session, "Admin", "admin@serena.com", "admin123", "caregiver"
+    )
+    doctor = get_or_create_user(
+        session, "Dr. Serena", "doctor@serena.com", "doctor123", "doctor"
+    )
+    # Senior
+    senior = session.query(Senior).filter(Senior.name == "Paciente Exemplo").first()
+    if not senior:
+        senior = Senior(
+            id="12345678901",  # CPF de exemplo, 11 dígitos
+            name="Paciente Exemplo",
+            birth_date="01/01/1950",
+            created_at=datetime.utcnow().isoformat(),
+        )
+        session.add(senior)
+    relate(session, doctor, senior)
+    relate(session, caregiver, senior)
+    # Device
+    device = session.query(Device).filter(Device.senior_id == senior.id).first()
+    if not device:
+        device = Device(
+            id="0", senior_id=senior.id, status="active", last_sync=datetime.utcnow()
+        )
+        session.add(device)
+    # Dispenser
+    dispenser = (
+        session.query(Dispenser).filter(Dispenser.device_id == device.id).first()
+    )
+    if not dispenser:
+        dispenser = Dispenser(device_id=device.id)
+        session.add(dispenser)
+    meds = session.query(Medication).all()
+    # Compartments
+    if (
+        not session.query(Compartment)
+        .filter(Compartment.dispenser_id == dispenser.id)
+        .first()
+    ):
+        for i in range(14):
+            # Deixe os 3 últimos compartimentos sem medicação
+            filled = i < 11 and bool(meds)
+            session.add(
+                Compartment(
+                    dispenser_id=dispenser.id,
+                    medication_id=meds[i % len(meds)].id if filled else "",
+                    quantity=10 + i if filled else 0,
+                )
+            )
+    # Prescriptions: frequências diferentes para os dois primeiros medicamentos
+    if (
+        not session.query(Prescription)
+        .filter(Prescription.senior_id == senior.id)
+        .first()
+    ):
+        now = datetime.utcnow()
+        for med, frequency in zip(meds[:2], ["8", "12"]):
+            session.add(
+                Prescription(
+                    senior_id=senior.id,
+                    medication_id=med.id,
+                    doctor_id=doctor.id,
+                    description=f"Qualquer descrição para {med.name}",
+                    dosage="1 comprimido",
+                    frequency=frequency,
+                    start_date=now,
+                    end_date=now + timedelta(days=30),
+                )
+            )
+    # Symptoms
+    if not session.query(Symptom).filter(Symptom.senior_id == senior.id).first():
+        session.add_all(
+            [
+                Symptom(
+                    senior_id=senior.id,
+                    name="Dor de cabeça",
+                    description="Paciente levantou rápido e sentiu dor",
+                    pain_level=5,
+                ),
+                Symptom(
+                    senior_id=senior.id,
+                    name="Náusea",
+                    description="Acordou enjoado",
+                    pain_level=2,
+                ),
+            ]
+        )
+    # Report
+    if not session.query(Report).filter(Report.user_id == caregiver.id).first():
+        session.add(
+            Report(
+                user_id=caregiver.id,
+                content="Relatório inicial do paciente.",
+                created_at=datetime.utcnow().isoformat(),
+            )
+        )
+
+
+def backfill_derived_tables(session: Session):
+    # Agenda de doses das prescrições que ainda não têm uma
+    pending = (
+        session.query(Prescription)
+        .filter(~Prescription.id.in_(session.query(DoseSchedule.prescription_id)))
+        .all()
+    )
+    for prescription in pending:
+        session.add_all(build_dose_schedule(prescription))
+    # Previsão de estoque dos compartimentos que ainda não têm uma
+    missing = (
+        session.query(Compartment)
+        .filter(
+            ~Compartment.compartment_id.in_(
+                session.query(CompartmentForecast.compartment_id)
+            )
+        )
+        .all()
+    )
+    if missing:
+        refresh_forecasts(session, missing)
+
+
+def seed_db(example_data: bool = True):
+    # Tudo numa transação: ou o banco fica semeado por inteiro, ou nada muda
+    with Session(engine) as session:
+        if example_data:
+            seed_example_data(session)
+        backfill_derived_tables(session)
+        session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--no-example-data",
+        action="store_true",
+        help="só os backfills (bancos de produção)",
+    )
+    args = parser.parse_args()
+    create_db_and_tables()
+    seed_db(example_data=not args.no_example_data)
+    print("Banco semeado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Banco descartável: precisa estar no ambiente antes do import de database
+_tmp = tempfile.mkdtemp(prefix="serena-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["SEED_DB"] = "0"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from database import (  # noqa: E402
+    engine,
+    get_current_user,
+    get_current_user_async,
+    user_cache,
+)
+from main import app  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    # Esquema limpo a cada teste
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    user_cache.clear()
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def user(db):
+    user = User(
+        name="Cuidador", email="cuidador@serena.com", password="x", role="caregiver"
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    return user
+
+
+@pytest.fixture
+def client(db, user):
+    # Autenticação fora da conta: os testes medem só o trabalho da rota
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_current_user_async] = lambda: user
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def count_statements():
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return counter
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from models.compartment import Compartment
+from models.device import Device
+from models.dispenser import Dispenser
+from models.doseevent import DoseEvent, DoseEventStatus
+from models.medication import Medication
+from models.senior import Senior
+
+STOCK = 20
+THREADS = 8
+DISPENSES_PER_THREAD = 5  # Pede o dobro do estoque
+
+
+def create_compartment(db, quantity: int) -> str:
+    medication = Medication(name="Dipirona")
+    senior = Senior(id="12345678901", name="Paciente", birth_date="01/01/1950")
+    device = Device(id="device-1", senior_id=senior.id, status="active")
+    dispenser = Dispenser(device_id=device.id)
+    compartment = Compartment(
+        dispenser_id=dispenser.id, medication_id=medication.id, quantity=quantity
+    )
+    db.add_all([medication, senior, device, dispenser, compartment])
+    db.commit()
+    return compartment.compartment_id
+
+
+def test_concurrent_dispenses_never_lose_updates_or_go_negative(client, db):
+    compartment_id = create_compartment(db, STOCK)
+
+    def dispense(_):
+        return client.post(
+            f"/compartment/{compartment_id}/dispense", json={"quantity": 1}
+        )
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        responses = list(pool.map(dispense, range(THREADS * DISPENSES_PER_THREAD)))
+
+    succeeded = [r.json() for r in responses if r.status_code == 200]
+    rejected = [r for r in responses if r.status_code == 409]
+    assert len(succeeded) + len(rejected) == len(responses)
+    assert len(succeeded) == STOCK
+    # Cada dispensa confirmada viu um estoque diferente: nenhuma se perdeu
+    assert sorted(r["quantity"] for r in succeeded) == list(range(STOCK))
+
+    db.expire_all()
+    compartment = db.get(Compartment, compartment_id)
+    assert compartment.quantity == 0
+    assert compartment.version == 1 + STOCK
+    dispensed = (
+        db.query(DoseEvent)
+        .filter(DoseEvent.status == DoseEventStatus.dispensed.value)
+        .count()
+    )
+    assert dispensed == STOCK
@@ -0,0 +1,40 @@
+from models.compartment import Compartment
+from models.device import Device
+from models.dispenser import Dispenser
+from models.medication import Medication
+from models.senior import Senior
+
+
+def test_layout_update_refreshes_forecasts_from_new_layout(client, db):
+    medication = Medication(name="Metformina")
+    senior = Senior(id="12345678901", name="Paciente", birth_date="01/01/1950")
+    device = Device(id="dev1", senior_id=senior.id, status="active")
+    dispenser = Dispenser(device_id=device.id)
+    compartment = Compartment(dispenser_id=dispenser.id, medication_id="", quantity=0)
+    db.add_all([medication, senior, device, dispenser, compartment])
+    db.commit()
+    dispenser_id, compartment_id = dispenser.id, compartment.compartment_id
+    medication_id = medication.id
+
+    response = client.put(
+        f"/dispenser/{dispenser_id}/compartments",
+        json=[
+            {
+                "compartment_id": compartment_id,
+                "medication_id": medication_id,
+                "quantity": 9,
+            }
+        ],
+    )
+    assert response.status_code == 200
+    (slot,) = response.json()["compartments"]
+    assert slot["medication_id"] == medication_id
+    assert slot["quantity"] == 9
+
+    # A previsão vem do layout novo, não dos objetos carregados antes do UPDATE
+    response = client.get(f"/compartment/forecast/by_dispenser/{dispenser_id}")
+    assert response.status_code == 200
+    (forecast,) = response.json()
+    assert forecast["compartment_id"] == compartment_id
+    assert forecast["medication_id"] == medication_id
+    assert forecast["quantity"] == 9
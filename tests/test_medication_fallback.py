@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from models.device import Device
+from models.medication import Medication
+from models.prescription import Prescription
+from models.senior import Senior
+from models.user import User
+from models.usersenior import UserSenior
+
+
+def test_prescription_reads_fall_back_to_database_on_catalog_miss(
+    client, db, user, monkeypatch
+):
+    # Medicação criada "em outro worker": o catálogo deste já carregou e não
+    # recarrega no miss, então o nome só pode vir do banco
+    monkeypatch.setattr("utils.medication_catalog.MISS_RELOAD_INTERVAL", float("inf"))
+    now = datetime.utcnow()
+    medication = Medication(name="Losartana", description="Anti-hipertensivo")
+    doctor = User(name="Dr. Serena", email="dr@serena.com", password="x", role="doctor")
+    senior = Senior(id="12345678901", name="Paciente", birth_date="01/01/1950")
+    prescription = Prescription(
+        senior_id=senior.id,
+        medication_id=medication.id,
+        doctor_id=doctor.id,
+        description="Tomar pela manhã",
+        dosage="1 comprimido",
+        frequency="12",
+        start_date=now,
+        end_date=now + timedelta(days=30),
+    )
+    db.add_all(
+        [
+            medication,
+            doctor,
+            senior,
+            Device(id="dev1", senior_id=senior.id, status="active"),
+            UserSenior(user_id=user.id, senior_id=senior.id),
+            prescription,
+        ]
+    )
+    db.commit()
+    expected = {"id": medication.id, "name": "Losartana"}
+
+    def medications(body):
+        return [{k: p["medication"][k] for k in expected} for p in body]
+
+    response = client.get(f"/prescriptions/{prescription.id}")
+    assert response.status_code == 200
+    assert medications([response.json()]) == [expected]
+    for path in ("/prescriptions/", "/prescriptions/by_device/dev1"):
+        response = client.get(path)
+        assert response.status_code == 200, path
+        assert medications(response.json()) == [expected], path
+
+    response = client.post("/device/dev1/sync", json={})
+    assert response.status_code == 200
+    assert medications(response.json()["prescriptions"]) == [expected]
+
+    response = client.get("/senior/dashboard", params={"include": "prescriptions"})
+    assert response.status_code == 200
+    assert medications(response.json()[0]["prescriptions"]) == [expected]
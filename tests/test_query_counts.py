@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from models.medication import Medication
+from models.prescription import Prescription
+from models.senior import Senior
+from models.user import User
+from utils.medication_catalog import medication_catalog
+from utils.pagination import MAX_PAGE_SIZE
+
+N = 10
+
+
+def add_prescriptions(db, senior_id: str, medication_ids: list, count: int):
+    # Um doctor por prescrição: um lazy load por linha apareceria na contagem
+    now = datetime.utcnow()
+    for i in range(count):
+        doctor = User(
+            name=f"Dr. {i}",
+            email=f"doctor-{now.timestamp()}-{i}@serena.com",
+            password="x",
+            role="doctor",
+        )
+        db.add(doctor)
+        db.add(
+            Prescription(
+                senior_id=senior_id,
+                medication_id=medication_ids[i % len(medication_ids)],
+                doctor_id=doctor.id,
+                description="Tomar após as refeições",
+                dosage="1 comprimido",
+                frequency="8",
+                start_date=now,
+                end_date=now + timedelta(days=30),
+            )
+        )
+    db.commit()
+
+
+def test_prescription_list_statements_do_not_grow_with_rows(
+    client, db, count_statements
+):
+    senior = Senior(id="12345678901", name="Paciente", birth_date="01/01/1950")
+    medications = [Medication(name=f"Remédio {i}") for i in range(3)]
+    db.add(senior)
+    db.add_all(medications)
+    db.commit()
+    medication_ids = [m.id for m in medications]
+    # Catálogo já carregado: uma recarga por ID desconhecido não entra na conta
+    medication_catalog.load(db)
+
+    counts = []
+    seeded = 0
+    for total in (N, 10 * N):
+        add_prescriptions(db, senior.id, medication_ids, total - seeded)
+        seeded = total
+        with count_statements() as statements:
+            response = client.get("/prescriptions/", params={"limit": MAX_PAGE_SIZE})
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body) == total
+        assert all(p["doctor"] and p["medication"] for p in body)
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1], counts
@@ -0,0 +1,47 @@
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel
+
+from database import create_db_and_tables, engine
+from models.compartment import Compartment
+
+# Colunas e índices que bancos criados por versões anteriores não têm
+ADDED_COLUMNS = [
+    ("prescription", "updated_at"),
+    ("compartment", "updated_at"),
+    ("compartment", "version"),
+]
+ADDED_INDEXES = [
+    "ix_prescription_senior_id_end_date",
+    "ix_prescription_created_at",
+    "ix_symptom_created_at",
+    "ix_symptom_senior_id_created_at",
+    "ix_user_created_at",
+]
+
+
+def test_boot_upgrades_existing_database(db):
+    with engine.begin() as conn:
+        for name in ADDED_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+        for table, column in ADDED_COLUMNS:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        conn.execute(
+            text(
+                "INSERT INTO compartment "
+                "(compartment_id, dispenser_id, medication_id, quantity) "
+                "VALUES ('c1', 'd1', '', 3)"
+            )
+        )
+
+    create_db_and_tables()
+    create_db_and_tables()  # Idempotente: o segundo boot não altera nada
+
+    inspector = inspect(engine)
+    for table, column in ADDED_COLUMNS:
+        assert column in {c["name"] for c in inspector.get_columns(table)}
+    for table in SQLModel.metadata.sorted_tables:
+        present = {i["name"] for i in inspector.get_indexes(table.name)}
+        assert {i.name for i in table.indexes} <= present, table.name
+    compartment = db.get(Compartment, "c1")
+    assert compartment.version == 1
+    assert compartment.updated_at is not None
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.doseevent import DoseEvent, DoseEventStatus
+
+STATUS_CODES = {s.value: code for code, s in enumerate(DoseEventStatus)}
+TAKEN_CODES = [STATUS_CODES["taken"], STATUS_CODES["late"]]
+ROLLING_WINDOWS = (7, 30)
+# Faixas de atraso (min) entre scheduled_at e taken_at; adiantadas caem na primeira
+LATE_BIN_EDGES = np.array([15, 30, 60, 120])
+LATE_BIN_LABELS = ["0-15", "15-30", "30-60", "60-120", "120+"]
+
+
+def load_dose_events(db: Session, senior_ids: list, since: datetime) -> dict:
+    # Uma única consulta em lote, convertida em colunas NumPy
+    index = {senior_id: i for i, senior_id in enumerate(senior_ids)}
+    rows = db.execute(
+        select(
+            DoseEvent.senior_id,
+            DoseEvent.scheduled_at,
+            DoseEvent.taken_at,
+            DoseEvent.status,
+        ).where(
+            DoseEvent.senior_id.in_(senior_ids),
+            DoseEvent.scheduled_at >= since,
+            # Saídas do dispenser não são doses agendadas
+            DoseEvent.status != DoseEventStatus.dispensed.value,
+        )
+    ).all()
+    seniors, scheduled, taken_at, status = zip(*rows) if rows else ([], [], [], [])
+    return {
+        "senior": np.fromiter((index[s] for s in seniors), np.int64, len(rows)),
+        "scheduled": np.array(scheduled, dtype="datetime64[s]"),
+        # None vira NaT
+        "taken_at": np.array(taken_at, dtype="datetime64[s]"),
+        "status": np.fromiter(
+            (STATUS_CODES.get(s, -1) for s in status), np.int8, len(rows)
+        ),
+    }
+
+
+def _grouped_rate(senior, mask, taken, n_seniors):
+    total = np.bincount(senior[mask], minlength=n_seniors)
+    hits = np.bincount(senior[mask & taken], minlength=n_seniors)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total, hits / total  # NaN para quem não tem eventos
+
+
+def compute_adherence(events: dict, n_seniors: int, days: int, now: datetime) -> dict:
+    senior, scheduled = events["senior"], events["scheduled"]
+    taken_at, status = events["taken_at"], events["status"]
+    now = np.datetime64(now, "s")
+    taken = np.isin(status, TAKEN_CODES)
+    past = scheduled <= now
+
+    def since(window_days):
+        return past & (scheduled >= now - np.timedelta64(window_days, "D"))
+
+    total, adherence = _grouped_rate(senior, since(days), taken, n_seniors)
+    rolling = {
+        window: _grouped_rate(senior, since(window), taken, n_seniors)[1]
+        for window in ROLLING_WINDOWS
+    }
+
+    # Distribuição de atraso: histograma por senior num único bincount
+    with_time = since(days) & taken & ~np.isnat(taken_at)
+    delay = (taken_at[with_time] - scheduled[with_time]).astype(np.float64) / 60
+    bins = np.searchsorted(LATE_BIN_EDGES, delay, side="right")
+    n_bins = len(LATE_BIN_LABELS)
+    late_histogram = np.bincount(
+        senior[with_time] * n_bins + bins, minlength=n_seniors * n_bins
+    ).reshape(n_seniors, n_bins)
+    delay_count = late_histogram.sum(axis=1)
+    delay_sum = np.bincount(
+        senior[with_time], weights=np.maximum(delay, 0), minlength=n_seniors
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_delay = delay_sum / delay_count
+
+    return {
+        "total": total,
+        "adherence": adherence,
+        "rolling": rolling,
+        "late_histogram": late_histogram,
+        "mean_delay": mean_delay,
+    }
+
+
+def _percent(value):
+    return None if np.isnan(value) else round(float(value) * 100, 1)
+
+
+def build_adherence_report(
+    db: Session, senior_ids: list, days: int, now: datetime = None
+) -> list:
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=max(days, *ROLLING_WINDOWS))
+    events = load_dose_events(db, senior_ids, since)
+    metrics = compute_adherence(events, len(senior_ids), days, now)
+    return [
+        {
+            "senior_id": senior_id,
+            "doses": int(metrics["total"][i]),
+            "adherence": _percent(metrics["adherence"][i]),
+            **{
+                f"adherence_{window}d": _percent(rates[i])
+                for window, rates in metrics["rolling"].items()
+            },
+            "mean_delay_minutes": (
+                None
+                if np.isnan(metrics["mean_delay"][i])
+                else round(float(metrics["mean_delay"][i]), 1)
+            ),
+            "late_distribution": dict(
+                zip(LATE_BIN_LABELS, metrics["late_histogram"][i].tolist())
+            ),
+        }
+        for i, senior_id in enumerate(senior_ids)
+    ]
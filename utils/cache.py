@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+
+class TaggedCache:
+    # Cache LRU em memória do processo, com TTL opcional e invalidação por tag.
+    # generation() permite descartar um valor calculado enquanto uma escrita
+    # concorrente invalidava a mesma tag.
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set de keys
+        self._generations = {}  # tag -> contador de invalidações
+        self._epoch = 0  # incrementado por clear()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value, _ = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._discard(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def generation(self, tags: Iterable) -> tuple:
+        with self._lock:
+            return self._generation(tags)
+
+    def set(
+        self,
+        key,
+        value,
+        tags: Iterable = (),
+        ttl: Optional[float] = None,
+        generation: Optional[tuple] = None,
+    ):
+        tags = tuple(tags)
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if generation is not None and generation != self._generation(tags):
+                return
+            self._discard(key)
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            self._data[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def invalidate_tag(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tags.get(tag, ())):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self._epoch += 1
+
+    def _generation(self, tags: Iterable) -> tuple:
+        return (self._epoch, *(self._generations.get(tag, 0) for tag in tags))
+
+    def _discard(self, key):
+        item = self._data.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
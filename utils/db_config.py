@@ -0,0 +1,55 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def is_memory_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and (":memory:" in url or url.endswith("://"))
+
+
+def get_engine_options(url: str) -> dict:
+    # SQL echo fica desligado a menos que DB_ECHO=1 (nunca ligado por padrão)
+    options = {"echo": env_bool("DB_ECHO")}
+    if is_memory_sqlite(url):
+        return options
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=env_bool("DB_POOL_PRE_PING", not url.startswith("sqlite")),
+    )
+    return options
+
+
+def get_sqlite_pragmas() -> dict:
+    return {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        # Valor negativo = tamanho em KiB
+        "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KIB", "20000")),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    }
+
+
+def configure_engine(engine: Engine, pragmas: dict = None):
+    # Para AsyncEngine, passe async_engine.sync_engine
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = get_sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
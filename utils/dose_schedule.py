@@ -0,0 +1,95 @@
+import heapq
+import math
+import re
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from sqlalchemy.orm import Session
+
+from models.doseschedule import DoseSchedule
+from models.prescription import Prescription
+
+INTERVAL = "interval"
+FIXED = "fixed"
+
+
+def parse_frequency(frequency: str) -> list:
+    # "8" -> a cada 8 horas; "08:00, 20:00" ou "8 20" -> horários fixos do dia
+    tokens = [t for t in re.split(r"[,;\s]+", (frequency or "").strip()) if t]
+    if len(tokens) == 1 and tokens[0].isdigit():
+        hours = int(tokens[0])
+        return [(INTERVAL, hours * 60)] if 0 < hours <= 24 else []
+    entries = []
+    for token in tokens:
+        hour, _, minute = token.partition(":")
+        if not hour.isdigit() or (minute and not minute.isdigit()):
+            continue
+        hour, minute = int(hour), int(minute or 0)
+        if hour < 24 and minute < 60:
+            entries.append((FIXED, hour * 60 + minute))
+    return sorted(set(entries))
+
+
+def build_dose_schedule(prescription: Prescription) -> list:
+    return [
+        DoseSchedule(
+            prescription_id=prescription.id,
+            senior_id=prescription.senior_id,
+            medication_id=prescription.medication_id,
+            kind=kind,
+            interval_minutes=value if kind == INTERVAL else None,
+            minute_of_day=value if kind == FIXED else None,
+            start_date=prescription.start_date,
+            end_date=prescription.end_date,
+        )
+        for kind, value in parse_frequency(prescription.frequency)
+    ]
+
+
+def replace_dose_schedule(db: Session, prescription: Prescription):
+    replace_dose_schedules(db, [prescription])
+
+
+def replace_dose_schedules(db: Session, prescriptions: list):
+    # Não faz commit: roda na mesma transação da escrita das prescrições
+    db.query(DoseSchedule).filter(
+        DoseSchedule.prescription_id.in_([p.id for p in prescriptions])
+    ).delete(synchronize_session=False)
+    for prescription in prescriptions:
+        db.add_all(build_dose_schedule(prescription))
+
+
+def delete_dose_schedule(db: Session, prescription_id: str):
+    db.query(DoseSchedule).filter(
+        DoseSchedule.prescription_id == prescription_id
+    ).delete(synchronize_session=False)
+
+
+def iter_dose_instants(entry: DoseSchedule, after: datetime, until: datetime = None):
+    start = max(after, entry.start_date)
+    end = min(until, entry.end_date) if until else entry.end_date
+    if entry.kind == INTERVAL:
+        step = timedelta(minutes=entry.interval_minutes)
+        steps = max(0, math.ceil((start - entry.start_date) / step))
+        instant = entry.start_date + steps * step
+        while instant <= end:
+            yield instant
+            instant += step
+    else:
+        day = start.date()
+        at = time(entry.minute_of_day // 60, entry.minute_of_day % 60)
+        while day <= end.date():
+            instant = datetime.combine(day, at)
+            if start <= instant <= end:
+                yield instant
+            day += timedelta(days=1)
+
+
+def _tagged_instants(entry: DoseSchedule, after: datetime):
+    for instant in iter_dose_instants(entry, after):
+        yield instant, entry
+
+
+def next_dose_instants(entries: list, after: datetime, n: int) -> list:
+    streams = [_tagged_instants(entry, after) for entry in entries]
+    return list(islice(heapq.merge(*streams, key=lambda item: item[0]), n))
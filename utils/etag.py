@@ -0,0 +1,93 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+
+def make_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Comparação fraca, como pede o RFC 9110 para If-None-Match
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+NOT_MODIFIED_HEADERS = {b"cache-control", b"content-location", b"expires", b"vary"}
+
+
+class ETagMiddleware:
+    # ASGI puro: GET com 200 e corpo numa única mensagem ganha um ETag fraco do
+    # corpo; If-None-Match igual vira 304 sem corpo. Respostas em streaming e
+    # rotas que já mandam ETag próprio passam direto.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+        start = None
+
+        async def send_with_etag(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                if message["status"] != 200 or any(
+                    name.lower() == b"etag" for name, _ in headers
+                ):
+                    await send(message)
+                else:
+                    start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            pending, start = start, None
+            if message.get("more_body", False):
+                # Streaming: não dá para hashear sem bufferizar tudo
+                await send(pending)
+                await send(message)
+                return
+            etag = make_etag(message.get("body", b""))
+            if etag_matches(if_none_match, etag):
+                # 304 repete só os cabeçalhos de cache (RFC 9110, 15.4.5)
+                headers = [
+                    (name, value)
+                    for name, value in pending.get("headers", [])
+                    if name.lower() in NOT_MODIFIED_HEADERS
+                ]
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 304,
+                        "headers": [*headers, (b"etag", etag.encode("latin-1"))],
+                    }
+                )
+                await send({"type": "http.response.body", "body": b""})
+                return
+            pending["headers"] = [
+                *pending.get("headers", []),
+                (b"etag", etag.encode("latin-1")),
+            ]
+            await send(pending)
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+
+
+class EventHub:
+    # Pub/sub em processo, por senior. Cada assinante tem uma fila limitada:
+    # quem não consome perde os eventos mais antigos, nunca trava o publicador.
+    # Com vários workers cada um tem o seu hub; os clientes reconectam e
+    # refazem o GET, então os eventos servem de aviso e não de fonte da verdade.
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._loop = None
+
+    @property
+    def active(self) -> bool:
+        # Permite pular consultas só necessárias para publicar
+        return bool(self._subscribers)
+
+    def subscribe(self, senior_id: str) -> asyncio.Queue:
+        # Chamado no event loop (rota WebSocket)
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers[senior_id].add(queue)
+        return queue
+
+    def unsubscribe(self, senior_id: str, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(senior_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[senior_id]
+
+    def publish(self, senior_id: str, event_type: str, **payload):
+        # Pode vir de rotas síncronas (threadpool): entrega via call_soon_threadsafe
+        with self._lock:
+            if senior_id not in self._subscribers:
+                return
+            loop = self._loop
+        event = {
+            "type": event_type,
+            "senior_id": senior_id,
+            "at": datetime.utcnow().isoformat(),
+            **payload,
+        }
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(senior_id, event)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, senior_id, event)
+
+    def _deliver(self, senior_id: str, event: dict):
+        with self._lock:
+            queues = list(self._subscribers.get(senior_id, ()))
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()  # Descarta o mais antigo
+            queue.put_nowait(event)
+
+
+event_hub = EventHub()
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from database import engine
+
+EXPORT_BATCH_SIZE = 1000
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _iter_batches(statement):
+    # Sessão própria: a sessão do Depends(get_session) é fechada antes do streaming
+    with Session(engine) as session:
+        result = session.execute(
+            statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for rows in result.partitions():
+            yield rows
+
+
+def _ndjson_lines(statement, columns: list):
+    for rows in _iter_batches(statement):
+        yield "".join(
+            json.dumps(
+                {col: _serialize(value) for col, value in zip(columns, row)},
+                ensure_ascii=False,
+            )
+            + "\n"
+            for row in rows
+        )
+
+
+def _csv_lines(statement, columns: list):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in _iter_batches(statement):
+        writer.writerows([_serialize(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Tabela vazia: envia ao menos o cabeçalho
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(
+    statement, columns: list, fmt: str, filename: str
+) -> StreamingResponse:
+    lines = (
+        _csv_lines(statement, columns)
+        if fmt == "csv"
+        else _ndjson_lines(statement, columns)
+    )
+    return StreamingResponse(
+        lines,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,120 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from models.compartment import Compartment
+from models.compartmentforecast import CompartmentForecast
+from models.device import Device
+from models.dispenser import Dispenser
+from models.doseschedule import DoseSchedule
+from utils.dose_schedule import INTERVAL, next_dose_instants
+
+# Antecedência da reposição em relação ao fim do estoque
+REFILL_LEAD_DAYS = int(os.getenv("REFILL_LEAD_DAYS", "3"))
+
+
+def doses_per_day(entries: list, now: datetime) -> float:
+    return sum(
+        24 * 60 / e.interval_minutes if e.kind == INTERVAL else 1
+        for e in entries
+        if e.start_date <= now <= e.end_date
+    )
+
+
+def forecast_empty_at(quantity: int, entries: list, now: datetime):
+    # Instante da dose que consome a última unidade; None se a agenda acaba antes
+    if quantity <= 0:
+        return now
+    instants = next_dose_instants(entries, now, quantity)
+    return instants[-1][0] if len(instants) == quantity else None
+
+
+def build_forecast(
+    compartment: Compartment, senior_id: str, entries: list, now: datetime
+) -> CompartmentForecast:
+    empty_at = forecast_empty_at(compartment.quantity, entries, now)
+    return CompartmentForecast(
+        compartment_id=compartment.compartment_id,
+        dispenser_id=compartment.dispenser_id,
+        senior_id=senior_id,
+        medication_id=compartment.medication_id,
+        quantity=compartment.quantity,
+        doses_per_day=doses_per_day(entries, now),
+        empty_at=empty_at,
+        refill_date=(
+            (empty_at - timedelta(days=REFILL_LEAD_DAYS)).date() if empty_at else None
+        ),
+        computed_at=now,
+    )
+
+
+def refresh_forecasts(db: Session, compartments: list, now: datetime = None):
+    # Não faz commit: roda na mesma transação da escrita que mudou o estoque
+    now = now or datetime.utcnow()
+    db.query(CompartmentForecast).filter(
+        CompartmentForecast.compartment_id.in_(
+            [c.compartment_id for c in compartments]
+        )
+    ).delete(synchronize_session="fetch")
+    compartments = [c for c in compartments if c.medication_id]
+    if not compartments:
+        return
+    seniors = dict(
+        db.query(Dispenser.id, Device.senior_id)
+        .join(Device, Device.id == Dispenser.device_id)
+        .filter(Dispenser.id.in_({c.dispenser_id for c in compartments}))
+        .all()
+    )
+    # Agenda vigente de todos os seniors envolvidos numa consulta só
+    schedules = defaultdict(list)
+    for entry in db.query(DoseSchedule).filter(
+        DoseSchedule.senior_id.in_(set(seniors.values())),
+        DoseSchedule.end_date >= now,
+    ):
+        schedules[(entry.senior_id, entry.medication_id)].append(entry)
+    db.add_all(
+        [
+            build_forecast(
+                c,
+                seniors[c.dispenser_id],
+                schedules[(seniors[c.dispenser_id], c.medication_id)],
+                now,
+            )
+            for c in compartments
+            if c.dispenser_id in seniors
+        ]
+    )
+
+
+def refresh_senior_forecasts(db: Session, senior_ids):
+    # Escritas de prescrição mudam a agenda: recalcula os compartimentos do senior
+    compartments = (
+        db.query(Compartment)
+        .join(Dispenser, Dispenser.id == Compartment.dispenser_id)
+        .join(Device, Device.id == Dispenser.device_id)
+        .filter(Device.senior_id.in_(senior_ids))
+        .all()
+    )
+    if compartments:
+        refresh_forecasts(db, compartments)
+
+
+def refresh_compartment_forecasts(db: Session, compartment_ids):
+    # Chamado depois de UPDATEs em Core, que não tocam os objetos já carregados
+    # na sessão: populate_existing relê medication_id/quantity do banco
+    compartments = (
+        db.query(Compartment)
+        .filter(Compartment.compartment_id.in_(compartment_ids))
+        .populate_existing()
+        .all()
+    )
+    if compartments:
+        refresh_forecasts(db, compartments)
+
+
+def delete_forecast(db: Session, compartment_id: str):
+    db.query(CompartmentForecast).filter(
+        CompartmentForecast.compartment_id == compartment_id
+    ).delete(synchronize_session=False)
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt libera o GIL, então um pool de threads dedicado basta. Fora do
+# threadpool das rotas, uma onda de logins não trava os outros endpoints.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 8)))
+HASH_RETRY_AFTER = os.getenv("HASH_RETRY_AFTER", "1")
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+class HashMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_total = 0.0
+        self.hash_max = 0.0
+
+    def admit(self) -> bool:
+        with self._lock:
+            if self.pending >= HASH_MAX_PENDING:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            return True
+
+    def done(self, queue_wait: float, hash_time: float):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self.queue_wait_total += queue_wait
+            self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+            self.hash_total += hash_time
+            self.hash_max = max(self.hash_max, hash_time)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": HASH_WORKERS,
+                "max_pending": HASH_MAX_PENDING,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_wait_avg_ms": self.queue_wait_total / completed * 1000,
+                "queue_wait_max_ms": self.queue_wait_max * 1000,
+                "hash_avg_ms": self.hash_total / completed * 1000,
+                "hash_max_ms": self.hash_max * 1000,
+            }
+
+
+hash_metrics = HashMetrics()
+
+
+async def _run_hash(fn, *args):
+    # Fila cheia: responde 503 na hora em vez de enfileirar mais trabalho
+    if not hash_metrics.admit():
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication is busy, try again shortly.",
+            headers={"Retry-After": HASH_RETRY_AFTER},
+        )
+    enqueued = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            hash_metrics.done(started - enqueued, time.perf_counter() - started)
+
+    return await asyncio.get_running_loop().run_in_executor(_executor, job)
+
+
+async def verify_password(plain_password, hashed_password) -> bool:
+    return await _run_hash(pwd_context.verify, plain_password, hashed_password)
+
+
+async def get_password_hash(password) -> str:
+    return await _run_hash(pwd_context.hash, password)
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Optional
+
+from sqlmodel import Session
+
+from database import engine
+from models.medication import Medication
+
+CATALOG_TTL = float(os.getenv("MEDICATION_CATALOG_TTL", "600"))
+# ID desconhecido (ex.: criado em outro worker) força recarga, no máximo 1x/s
+MISS_RELOAD_INTERVAL = 1.0
+
+
+def fold(text: str) -> str:
+    # "Ácido Acetilsalicílico" -> "acido acetilsalicilico"
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class MedicationCatalog:
+    # Cópia em memória da tabela Medication, pequena e quase só lida. Cada carga
+    # monta um snapshot novo e troca a referência; leitores nunca veem meio termo.
+    def __init__(self, ttl: float = CATALOG_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_id = {}
+        # Índice de prefixo: (sufixo dobrado a partir de cada palavra, id), ordenado
+        self._keys = []
+        self._ids = []
+        self._loaded_at = None
+        self._miss_reload_at = 0.0
+        self._refreshing = False
+
+    def load(self, db: Session = None):
+        if db is None:
+            with Session(engine) as session:
+                return self.load(session)
+        rows = db.query(Medication.id, Medication.name, Medication.description).all()
+        by_id = {
+            id_: {"id": id_, "name": name, "description": description}
+            for id_, name, description in rows
+        }
+        index = []
+        for id_, name, _ in rows:
+            folded = fold(name)
+            starts = [0] + [i + 1 for i, c in enumerate(folded) if c == " "]
+            index.extend((folded[start:], id_) for start in starts)
+        index.sort()
+        with self._lock:
+            self._by_id = by_id
+            self._keys = [key for key, _ in index]
+            self._ids = [id_ for _, id_ in index]
+            self._loaded_at = time.monotonic()
+
+    def _reload(self):
+        # No event loop nunca faz I/O síncrono: recarrega numa thread e segue com
+        # o snapshot atual. Rotas síncronas (threadpool) e scripts podem esperar.
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.load()
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(
+            target=self._background_load, name="medication-catalog", daemon=True
+        ).start()
+
+    def _background_load(self):
+        try:
+            self.load()
+        finally:
+            self._refreshing = False
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            self._reload()
+
+    def get(self, medication_id: Optional[str]) -> Optional[dict]:
+        if not medication_id:
+            return None
+        self._ensure_fresh()
+        medication = self._by_id.get(medication_id)
+        now = time.monotonic()
+        if medication is None and now - self._miss_reload_at > MISS_RELOAD_INTERVAL:
+            self._miss_reload_at = now
+            self._reload()
+            # Em rota async ainda None: o nome aparece a partir do próximo request
+            medication = self._by_id.get(medication_id)
+        return medication
+
+    def name(self, medication_id: Optional[str]) -> Optional[str]:
+        medication = self.get(medication_id)
+        return medication["name"] if medication else None
+
+    def search(self, query: str, limit: int = 20) -> list:
+        self._ensure_fresh()
+        prefix = fold(query).strip()
+        if not prefix:
+            return []
+        with self._lock:
+            keys, ids, by_id = self._keys, self._ids, self._by_id
+        found = {}
+        position = bisect_left(keys, prefix)
+        while (
+            position < len(keys)
+            and keys[position].startswith(prefix)
+            and len(found) < limit
+        ):
+            found.setdefault(ids[position], by_id[ids[position]])
+            position += 1
+        return sorted(found.values(), key=lambda m: fold(m["name"]))
+
+
+medication_catalog = MedicationCatalog()
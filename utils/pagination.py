@@ -0,0 +1,63 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if _is_datetime(col) else v
+            for col, v in zip(columns, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+
+def _is_datetime(column) -> bool:
+    try:
+        return column.type.python_type is datetime
+    except NotImplementedError:
+        return False
+
+
+def _after(columns: list, values: list):
+    # (c1, c2) > (v1, v2)  ==>  c1 > v1 OR (c1 = v1 AND c2 > v2)
+    col, value = columns[0], values[0]
+    if len(columns) == 1:
+        return col > value
+    return or_(col > value, and_(col == value, _after(columns[1:], values[1:])))
+
+
+def apply_keyset(query, columns: list, limit: int, after: str | None = None):
+    # Funciona tanto com db.query(...) quanto com select(...)
+    if after:
+        query = query.filter(_after(columns, decode_cursor(after, columns)))
+    # Busca uma linha a mais para saber se existe próxima página
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def split_page(rows: list, columns: list, limit: int):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, col.key) for col in columns])
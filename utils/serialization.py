@@ -0,0 +1,24 @@
+from functools import lru_cache
+from typing import List
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def dump_json_list(model, items) -> bytes:
+    # Valida e serializa direto para bytes no pydantic-core, sem jsonable_encoder
+    adapter = list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+
+def json_list_response(model, items, headers: dict = None) -> Response:
+    return Response(
+        content=dump_json_list(model, items),
+        media_type="application/json",
+        headers=headers,
+    )